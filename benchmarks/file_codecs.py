@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""Compares write and read throughput of the FileStorage file formats
+
+read decodes every record; read+build also creates the model objects
+the way an eager reload() does.
+
+Usage: ./benchmarks/file_codecs.py [records]
+"""
+import os
+import sys
+import tempfile
+import time
+from models.engine.file_codecs import BinaryCodec, JSONCodec
+from models.review import Review
+
+if __name__ == "__main__":
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dicts = [Review(text="Nice stay", place_id="p", user_id="u").to_dict()
+             for _ in range(records)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in (JSONCodec(), BinaryCodec()):
+            path = os.path.join(tmp, 'data')
+            start = time.perf_counter()
+            with open(path, 'wb' if codec.binary else 'w') as f:
+                codec.write(f, (('Review.' + d['id'], codec.dumps(d))
+                                for d in dicts))
+            write = time.perf_counter() - start
+            start = time.perf_counter()
+            with open(path, 'rb' if codec.binary else 'r') as f:
+                for _ in codec.records(f, set()):
+                    pass
+            read = time.perf_counter() - start
+            start = time.perf_counter()
+            with open(path, 'rb' if codec.binary else 'r') as f:
+                for key, raw, val in codec.records(f, set()):
+                    Review(**(val or codec.loads(raw, 'Review')))
+            build = time.perf_counter() - start
+            print("{:>11}: {:6.1f} MiB  write {:9.0f}/s  read {:9.0f}/s  "
+                  "read+build {:9.0f}/s".format(
+                      type(codec).__name__, os.path.getsize(path) / 2**20,
+                      records / write, records / read, records / build))
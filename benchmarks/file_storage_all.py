@@ -0,0 +1,22 @@
+#!/usr/bin/python3
+"""Times FileStorage.all(City) while the total object count grows
+
+Usage: ./benchmarks/file_storage_all.py [total ...]
+"""
+import sys
+import timeit
+from models import storage
+from models.base_model import BaseModel
+from models.city import City
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]
+    for _ in range(100):
+        storage.new(City(name="City", state_id="0"))
+    for total in sizes:
+        while len(storage.all()) < total:
+            storage.new(BaseModel())
+        runs = 1000
+        seconds = timeit.timeit(lambda: storage.all(City), number=runs)
+        print("{:>9} objects: all(City) {:.2f} us".format(
+            total, seconds / runs * 1e6))
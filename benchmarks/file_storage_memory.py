@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""Reports the memory FileStorage holds per object of each class
+
+For every class a file of that class's objects is written once, then
+read back in a fresh interpreter by each mode: eager objects, lazy raw
+records (HBNB_FILE_LAZY=1) and compact column tables
+(HBNB_FILE_COMPACT=1). tracemalloc measures what reload() keeps
+allocated, which includes the record of what was last read.
+
+Usage: ./benchmarks/file_storage_memory.py [objects per class]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+MODES = {
+    'eager': {},
+    'lazy': {'HBNB_FILE_LAZY': '1'},
+    'compact': {'HBNB_FILE_COMPACT': '1'},
+}
+CLASSES = ('State', 'City', 'User', 'Amenity', 'Place', 'Review')
+WRITE = """
+import random, sys
+from models import storage
+from models.{module} import {name}
+
+count = int(sys.argv[1])
+random.seed(0)
+parents = ["{{:036d}}".format(i) for i in range(max(1, count // 100))]
+fields = {{
+    'State': lambda i: dict(name="State {{}}".format(i)),
+    'City': lambda i: dict(name="City {{}}".format(i),
+                           state_id=random.choice(parents)),
+    'User': lambda i: dict(email="user{{}}@hbnb.io".format(i),
+                           password="pwd", first_name="Betty",
+                           last_name="Holberton"),
+    'Amenity': lambda i: dict(name="Amenity {{}}".format(i)),
+    'Place': lambda i: dict(
+        name="Place {{}}".format(i), city_id=random.choice(parents),
+        user_id=random.choice(parents), description="A nice place",
+        number_rooms=random.randrange(1, 6), number_bathrooms=1,
+        max_guest=random.randrange(1, 10),
+        price_by_night=random.randrange(20, 400),
+        latitude=random.uniform(-90, 90), longitude=random.uniform(-180, 180)),
+    'Review': lambda i: dict(text="Review {{}}".format(i),
+                             place_id=random.choice(parents),
+                             user_id=random.choice(parents)),
+}}['{name}']
+for i in range(count):
+    storage.new({name}(**fields(i)))
+storage.save()
+"""
+READ = """
+import os, tracemalloc
+from models import storage
+from models.{module} import {name}
+
+{name}()
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+os.rename('data.json', 'file.json')
+storage.reload()
+print(tracemalloc.get_traced_memory()[0] - before, storage.count({name}))
+"""
+
+if __name__ == "__main__":
+    count = sys.argv[1] if len(sys.argv) > 1 else '20000'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    for name in ('HBNB_TYPE_STORAGE', 'HBNB_FILE_PATH', 'HBNB_FILE_FORMAT',
+                 'HBNB_FILE_LAZY', 'HBNB_FILE_COMPACT', 'HBNB_FILE_SHARDED'):
+        env.pop(name, None)
+    print("{:>8}  {}".format('bytes/object', '  '.join(
+        "{:>9}".format(mode) for mode in MODES)))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in CLASSES:
+            module = name.lower()
+            data = os.path.join(tmp, 'data.json')
+            subprocess.run([sys.executable, '-c', WRITE.format(
+                module=module, name=name), count], cwd=tmp, env=env,
+                check=True)
+            os.rename(os.path.join(tmp, 'file.json'), data)
+            sizes = []
+            for mode, settings in MODES.items():
+                run = os.path.join(tmp, mode)
+                os.mkdir(run)
+                shutil.copy(data, run)
+                out = subprocess.run(
+                    [sys.executable, '-c', READ.format(
+                        module=module, name=name)],
+                    cwd=run, env=dict(env, **settings), capture_output=True,
+                    text=True, check=True).stdout.split()
+                shutil.rmtree(run)
+                sizes.append(int(out[0]) / int(out[1]))
+            os.remove(data)
+            print("{:>12}  {}".format(name, '  '.join(
+                "{:9.0f}".format(size) for size in sizes)))
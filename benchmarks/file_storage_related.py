@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+"""Times the /cities_by_states access pattern in FileStorage
+
+Every state's cities are read once, through the state_id reverse index
+(State.cities) and through the scan State.cities used to do.
+
+Usage: ./benchmarks/file_storage_related.py [states] [cities]
+"""
+import sys
+import time
+from models import storage
+from models.city import City
+from models.state import State
+
+if __name__ == "__main__":
+    states = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    cities = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    state_list = [State(name=str(i)) for i in range(states)]
+    for state in state_list:
+        storage.new(state)
+    for i in range(cities):
+        storage.new(City(name=str(i), state_id=state_list[i % states].id))
+
+    start = time.perf_counter()
+    for state in storage.all(State).values():
+        state.cities
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for state in storage.all(State).values():
+        [city for city in storage.all(City).values()
+         if city.state_id == state.id]
+    scanned = time.perf_counter() - start
+    print("{} states x {} cities: index {:.2f} ms, scan {:.2f} ms".format(
+        states, cities, indexed * 1000, scanned * 1000))
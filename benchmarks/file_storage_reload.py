@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""Measures startup time and peak RSS of FileStorage.reload()
+
+Each mode runs in a fresh interpreter against the same generated file:
+json.load is the previous whole-file reload, eager streams records and
+builds every object, lazy streams records and builds none until used.
+
+Usage: ./benchmarks/file_storage_reload.py [records]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+MODES = {
+    'json.load': """
+import json
+from models.review import Review
+with open('../file.json') as f:
+    objects = {k: Review(**v) for k, v in json.load(f).items()}
+""",
+    'eager': "from models import storage",
+    'lazy': "from models import storage",
+}
+REPORT = """
+import resource, time
+print(time.perf_counter() - start,
+      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+if __name__ == "__main__":
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'file.json'), 'w') as f:
+            data = {}
+            for _ in range(records):
+                i = str(uuid.uuid4())
+                data['Review.' + i] = {
+                    'id': i, '__class__': 'Review', 'text': 'Nice stay',
+                    'place_id': str(uuid.uuid4()),
+                    'user_id': str(uuid.uuid4()),
+                    'created_at': '2017-09-28T21:03:54.052298',
+                    'updated_at': '2017-09-28T21:03:54.052302'}
+            json.dump(data, f)
+            del data
+        os.mkdir(os.path.join(tmp, 'empty'))
+        for mode, code in MODES.items():
+            env = dict(os.environ, PYTHONPATH=root,
+                       HBNB_FILE_LAZY='1' if mode == 'lazy' else '0')
+            env.pop('HBNB_TYPE_STORAGE', None)
+            script = ("import time\nstart = time.perf_counter()\n" +
+                      code + REPORT)
+            cwd = os.path.join(tmp, 'empty') if mode == 'json.load' else tmp
+            out = subprocess.run([sys.executable, '-c', script], cwd=cwd,
+                                 env=env, capture_output=True, text=True,
+                                 check=True).stdout.split()
+            print("{:>9}: {:7.2f} s {:8.1f} MiB peak RSS".format(
+                mode, float(out[0]), int(out[1]) / 1024))
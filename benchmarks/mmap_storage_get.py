@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+"""Times a cold-start point lookup in MMapStorage as the store grows
+
+For each size a compacted store is built, then a fresh interpreter maps
+it and fetches one object; the time covers reload() and get() only.
+
+Usage: ./benchmarks/mmap_storage_get.py [records ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+LOOKUP = """
+import time
+from models.engine.mmap_storage import MMapStorage
+from models.base_model import BaseModel
+start = time.perf_counter()
+storage = MMapStorage()
+storage.reload()
+assert storage.get(BaseModel, sys.argv[1]) is not None
+print(time.perf_counter() - start)
+"""
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10000, 100000, 1000000]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    from models.base_model import BaseModel
+    from models.engine.mmap_storage import MMapStorage
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['HBNB_MMAP_PATH'] = os.path.join(tmp, 'file.dat')
+        storage = MMapStorage()
+        storage.reload()
+        count = 0
+        for size in sizes:
+            while count < size:
+                obj = BaseModel()
+                storage.new(obj)
+                count += 1
+            storage.compact()
+            out = subprocess.run(
+                [sys.executable, '-c', 'import sys\n' + LOOKUP, obj.id],
+                env=dict(os.environ, PYTHONPATH=root), cwd=tmp,
+                capture_output=True, text=True, check=True).stdout
+            print("{:>9} records: reload + get {:.2f} ms".format(
+                size, float(out) * 1000))
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""Compares objects/s of the model codecs with the code they replaced
+
+before runs copies of the BaseModel.__init__ and to_dict() that worked
+out the class name and dates for every object and set every attribute
+through SQLAlchemy; after runs the ModelCodec of the class. init builds
+objects from keyword arguments, leaving out the __init__ wrapper of
+SQLAlchemy that costs the same either way; load builds them from the
+records reload() reads and to_dict turns them back into records, as
+save() does.
+
+Usage: ./benchmarks/model_codecs.py [objects]
+"""
+import sys
+import time
+import uuid
+from datetime import datetime
+from models.engine.model_codecs import codec_of
+from models.place import Place
+
+
+def init_before(obj, kwargs):
+    """The former BaseModel.__init__"""
+    if 'id' not in kwargs:
+        obj.id = str(uuid.uuid4())
+    if 'created_at' not in kwargs:
+        obj.created_at = datetime.now()
+    if 'updated_at' not in kwargs:
+        obj.updated_at = datetime.now()
+    for key, value in kwargs.items():
+        if ((key == "created_at" or key == "updated_at") and
+                isinstance(value, str)):
+            setattr(obj, key, datetime.fromisoformat(value))
+        elif key != "__class__":
+            setattr(obj, key, value)
+
+
+def to_dict_before(obj):
+    """The former BaseModel.to_dict"""
+    dictionary = {}
+    dictionary.update(obj.__dict__)
+    dictionary.update({'__class__':
+                       (str(type(obj)).split('.')[-1]).split('\'')[0]})
+    if 'created_at' in dictionary:
+        dictionary['created_at'] = obj.created_at.isoformat()
+    if 'updated_at' in dictionary:
+        dictionary['updated_at'] = obj.updated_at.isoformat()
+    dictionary.pop("_sa_instance_state", None)
+    return dictionary
+
+
+def rate(count, run):
+    """Returns the objects/s of run, which handles count objects"""
+    start = time.perf_counter()
+    run()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    codec = codec_of(Place)
+    kwargs = [{"name": "Place {}".format(i), "city_id": "c", "user_id": "u",
+               "number_rooms": i % 5, "price_by_night": i % 300,
+               "latitude": 37.77, "longitude": -122.43}
+              for i in range(count)]
+    objects = [Place(**values) for values in kwargs]
+    records = [obj.to_dict() for obj in objects]
+    new = Place._sa_class_manager.new_instance
+
+    def init_old():
+        for values in kwargs:
+            init_before(new(), values)
+
+    def load_old():
+        for record in records:
+            init_before(new(), record)
+
+    cases = {
+        'init': (init_old,
+                 lambda: [codec.hydrate(new(), kw) for kw in kwargs]),
+        'load': (load_old,
+                 lambda: [codec.load(record) for record in records]),
+        'to_dict': (lambda: [to_dict_before(obj) for obj in objects],
+                    lambda: [codec.to_dict(obj) for obj in objects]),
+    }
+    print("{:>8}  {:>12} {:>12} {:>8}".format(
+        '', 'before', 'after', 'speedup'))
+    for name, (before, after) in cases.items():
+        old, new_rate = rate(count, before), rate(count, after)
+        print("{:>8}  {:10.0f}/s {:10.0f}/s {:7.2f}x".format(
+            name, old, new_rate, new_rate / old))
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Loads Review rows into each storage engine and reports rows/s
+
+Every engine runs in a fresh interpreter and working directory, once
+with bulk_upsert() on dicts and once with new_many() on Review objects
+followed by a single save(). The reviews point at one place and user,
+created first so that MySQL's foreign keys hold. MySQL is only run when
+HBNB_MYSQL_HOST is set, with the usual HBNB_MYSQL_* variables.
+
+Usage: ./benchmarks/storage_bulk.py [rows]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ENGINES = {
+    'file (json)': {},
+    'file (bin)': {'HBNB_FILE_PATH': 'file.bin'},
+    'mmap': {'HBNB_TYPE_STORAGE': 'mmap'},
+    'sqlite': {'HBNB_TYPE_STORAGE': 'sqlite'},
+    'mysql': {'HBNB_TYPE_STORAGE': 'db'},
+}
+WORKLOAD = """
+import sys, time
+from models import storage
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+rows, mode = int(sys.argv[1]), sys.argv[2]
+state = State(name="State")
+city = City(name="City", state_id=state.id)
+user = User(email="a@b.c", password="pwd")
+place = Place(name="Place", city_id=city.id, user_id=user.id)
+storage.new_many([state, city, user, place])
+storage.save()
+data = [{"text": "Review {}".format(i), "place_id": place.id,
+         "user_id": user.id} for i in range(rows)]
+start = time.perf_counter()
+if mode == "bulk_upsert":
+    storage.bulk_upsert(Review, data)
+else:
+    storage.new_many([Review(**row) for row in data])
+    storage.save()
+print(time.perf_counter() - start)
+"""
+
+if __name__ == "__main__":
+    rows = sys.argv[1] if len(sys.argv) > 1 else '1000000'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for engine, settings in ENGINES.items():
+        if engine == 'mysql' and not os.environ.get('HBNB_MYSQL_HOST'):
+            print("{:>12}: skipped, HBNB_MYSQL_HOST is not set".format(engine))
+            continue
+        env = dict(os.environ, PYTHONPATH=root, **settings)
+        if 'HBNB_TYPE_STORAGE' not in settings:
+            env.pop('HBNB_TYPE_STORAGE', None)
+        results = []
+        for mode in ('bulk_upsert', 'new_many'):
+            with tempfile.TemporaryDirectory() as tmp:
+                seconds = float(subprocess.run(
+                    [sys.executable, '-c', WORKLOAD, rows, mode], cwd=tmp,
+                    env=env, capture_output=True, text=True,
+                    check=True).stdout)
+            results.append(int(rows) / seconds)
+        print("{:>12}: bulk_upsert {:9.0f} rows/s, new_many + save {:9.0f}"
+              " rows/s".format(engine, *results))
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Runs the same workload against each storage engine
+
+Every engine runs in a fresh interpreter and working directory: insert
+states with their cities and save, then all(City), get() of random
+cities and a query() of the sorted cities of random states, each after
+close() so that the data is read back from storage. MySQL is only run
+when HBNB_MYSQL_HOST is set, with the usual HBNB_MYSQL_* variables.
+
+Usage: ./benchmarks/storage_engines.py [states] [cities per state]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+ENGINES = {
+    'file (json)': {},
+    'sqlite file': {'HBNB_TYPE_STORAGE': 'sqlite',
+                    'HBNB_SQLITE_PATH': 'hbnb.db'},
+    'sqlite :memory:': {'HBNB_TYPE_STORAGE': 'sqlite',
+                        'HBNB_SQLITE_PATH': ':memory:'},
+    'mysql': {'HBNB_TYPE_STORAGE': 'db'},
+}
+WORKLOAD = """
+import random, sys, time
+from models import storage
+from models.state import State
+from models.city import City
+
+states, per_state = int(sys.argv[1]), int(sys.argv[2])
+random.seed(0)
+start = time.perf_counter()
+state_ids, city_ids = [], []
+for i in range(states):
+    state = State(name="State {}".format(i))
+    storage.new(state)
+    state_ids.append(state.id)
+    for j in range(per_state):
+        city = City(name="City {}".format(random.random()), state_id=state.id)
+        storage.new(city)
+        city_ids.append(city.id)
+storage.save()
+timings = [time.perf_counter() - start]
+
+storage.close()
+start = time.perf_counter()
+assert len(storage.all(City)) == states * per_state
+timings.append(time.perf_counter() - start)
+
+storage.close()
+start = time.perf_counter()
+for city_id in random.sample(city_ids, min(1000, len(city_ids))):
+    assert storage.get(City, city_id) is not None
+timings.append(time.perf_counter() - start)
+
+storage.close()
+start = time.perf_counter()
+for state_id in random.sample(state_ids, min(100, len(state_ids))):
+    storage.query(City, where={"state_id": state_id}, order_by="name")
+timings.append(time.perf_counter() - start)
+print(*timings)
+"""
+
+if __name__ == "__main__":
+    states = sys.argv[1] if len(sys.argv) > 1 else '100'
+    per_state = sys.argv[2] if len(sys.argv) > 2 else '100'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print("{:>15}  {:>9} {:>9} {:>9} {:>9}".format(
+        'engine', 'insert', 'all', 'get x1000', 'query x100'))
+    for engine, settings in ENGINES.items():
+        if engine == 'mysql' and not os.environ.get('HBNB_MYSQL_HOST'):
+            print("{:>15}  skipped, HBNB_MYSQL_HOST is not set".format(
+                engine))
+            continue
+        env = dict(os.environ, PYTHONPATH=root, **settings)
+        if not settings:
+            env.pop('HBNB_TYPE_STORAGE', None)
+        with tempfile.TemporaryDirectory() as tmp:
+            out = subprocess.run(
+                [sys.executable, '-c', WORKLOAD, states, per_state],
+                cwd=tmp, env=env, capture_output=True, text=True,
+                check=True).stdout.split()
+        print("{:>15}  {:7.3f} s {:7.3f} s {:7.3f} s {:7.3f} s".format(
+            engine, *map(float, out)))
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""Measures storage.nearby() on FileStorage against a scan of the places
+
+Half of the places are spread over the globe and half are clustered
+around a few cities, as listings are. Queries around random cities ask
+for the places within a radius and for the nearest places; a scan of
+every place with haversine() answers the first query of each kind, to
+check the results and show what the grid saves. The first nearby() call
+builds the grid; that time is reported on its own.
+
+Usage: ./benchmarks/storage_nearby.py [places] [queries]
+"""
+import random
+import sys
+import time
+from models import storage
+from models.engine.spatial import nearest
+from models.place import Place
+
+
+def percentile(times, fraction):
+    """Returns the time below which fraction of the times fall"""
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * fraction))]
+
+
+if __name__ == "__main__":
+    places = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    random.seed(0)
+    cities = [(random.uniform(-60, 70), random.uniform(-180, 180))
+              for _ in range(200)]
+    storage.all().clear()
+    batch = []
+    for i in range(places):
+        if i % 2:
+            lat, lon = random.uniform(-90, 90), random.uniform(-180, 180)
+        else:
+            lat, lon = random.choice(cities)
+            lat = max(-90, min(90, random.gauss(lat, 0.1)))
+            lon = max(-180, min(180, random.gauss(lon, 0.1)))
+        batch.append(Place(name="Place {}".format(i), latitude=lat,
+                           longitude=lon))
+        if len(batch) == 10000:
+            storage.new_many(batch)
+            batch = []
+    storage.new_many(batch)
+    start = time.perf_counter()
+    storage.nearby(0, 0, 1)
+    build = time.perf_counter() - start
+    print("{} places, grid built in {:.2f} s".format(places, build))
+    points = [(place, place.latitude, place.longitude)
+              for place in storage.all(Place).values()]
+    print("{:>16}  {:>8}  {:>9}  {:>9}  {:>9}".format(
+        'query', 'found', 'mean', 'p99', 'scan'))
+    for name, radius_km, limit in (('1 km', 1, None), ('5 km', 5, None),
+                                   ('25 km, 10', 25, 10),
+                                   ('10 nearest', None, 10)):
+        times = []
+        found = 0
+        for number in range(queries):
+            lat, lon = random.choice(cities)
+            lat, lon = lat + random.gauss(0, 0.05), lon + random.gauss(0, 0.05)
+            start = time.perf_counter()
+            result = storage.nearby(lat, lon, radius_km, limit)
+            times.append((time.perf_counter() - start) * 1000)
+            found += len(result)
+            if number == 0:
+                start = time.perf_counter()
+                expected = nearest(points, lat, lon, radius_km, limit)
+                scan = (time.perf_counter() - start) * 1000
+                assert [p for p, _ in result] == [p for _, p in expected]
+        print("{:>16}  {:8.1f}  {:6.3f} ms  {:6.3f} ms  {:6.0f} ms".format(
+            name, found / queries, sum(times) / queries,
+            percentile(times, 0.99), scan))
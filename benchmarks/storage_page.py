@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+"""Times the first and a deep page of states, by cursor and by offset
+
+A page is found with page() and the cursor of the page before it, and
+with query(order_by, limit, offset) as the list pages used to be cut.
+Run with HBNB_TYPE_STORAGE=sqlite (and HBNB_SQLITE_PATH) for the DB side.
+
+Usage: ./benchmarks/storage_page.py [states] [page size]
+"""
+import sys
+import time
+from models import storage
+from models.state import State
+
+
+def timed(function, runs=20):
+    """Returns the mean time of function() in ms"""
+    start = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+if __name__ == "__main__":
+    states = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    for i in range(states):
+        storage.new(State(name="State {:07d}".format(i)))
+    storage.save()
+    deep = states - 2 * size
+    cursor = storage.page(State, deep)[1]
+    storage.page(State, size)
+    for depth, after in ((0, None), (deep, cursor)):
+        by_cursor = timed(lambda: storage.page(State, size, after))
+        by_offset = timed(lambda: storage.query(
+            State, order_by="name", limit=size, offset=depth))
+        print("page at {:>8}: cursor {:8.3f} ms, offset {:8.3f} ms".format(
+            depth, by_cursor, by_offset))
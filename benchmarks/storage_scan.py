@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""Compares analytic scans over objects with the FileStorage column stores
+
+"places in a city under $100 with 3 rooms or more" and "review count per
+user" are answered once by a Python loop over storage.all() and once by
+query() and aggregate(), which read the column stores. The first call
+builds a store from the objects; that time is reported on its own.
+
+Usage: ./benchmarks/storage_scan.py [places] [reviews per place]
+"""
+import random
+import sys
+import time
+from collections import Counter
+from models import storage
+from models.place import Place
+from models.review import Review
+
+
+def timed(run, repeat=5):
+    """Returns the result of run and its best time in ms"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    places = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    per_place = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    random.seed(0)
+    cities = ["city-{}".format(i) for i in range(100)]
+    users = ["user-{}".format(i) for i in range(5000)]
+    storage.all().clear()
+    for i in range(places):
+        place = Place(name="Place {}".format(i), city_id=random.choice(cities),
+                      user_id=random.choice(users),
+                      price_by_night=random.randrange(20, 400),
+                      number_rooms=random.randrange(1, 6),
+                      max_guest=random.randrange(1, 10))
+        storage.new(place)
+        for _ in range(per_place):
+            storage.new(Review(text="Nice", place_id=place.id,
+                               user_id=random.choice(users)))
+    where = {'city_id': cities[0], 'price_by_night <': 100,
+             'number_rooms >=': 3}
+
+    def scan_places():
+        return [p for p in storage.all(Place).values()
+                if p.city_id == cities[0] and p.price_by_night < 100 and
+                p.number_rooms >= 3]
+
+    def scan_reviews():
+        return Counter(r.user_id for r in storage.all(Review).values())
+
+    rows = [('places', places, scan_places,
+             lambda: storage.query(Place, where)),
+            ('reviews/user', places * per_place, scan_reviews,
+             lambda: storage.aggregate(Review, group_by='user_id'))]
+    print("{:>12}  {:>9}  {:>11}  {:>11}  {:>11}".format(
+        'scan', 'rows', 'objects', 'build', 'columns'))
+    for name, count, scan, columns in rows:
+        expected, objects = timed(scan)
+        _, build = timed(columns, 1)
+        result, column = timed(columns)
+        if isinstance(expected, Counter):
+            assert result == dict(expected)
+        else:
+            assert sorted(p.id for p in result) == sorted(
+                p.id for p in expected)
+        print("{:>12}  {:9d}  {:8.1f} ms  {:8.1f} ms  {:8.1f} ms".format(
+            name, count, objects, build, column))
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""Compares place search queries scanned in Python with the sorted indexes
+
+Each query of a search page, a price range or the cheapest places with a
+filter, is answered once by select() over storage.all() and once by
+query(), which seeks into the sorted (field, id) indexes of Place. The
+first call builds the indexes it needs; that time is reported on its
+own.
+
+Usage: ./benchmarks/storage_sorted.py [places]
+"""
+import random
+import sys
+import time
+from models import storage
+from models.engine.file_storage import select
+from models.place import Place
+
+
+def timed(run, repeat=5):
+    """Returns the result of run and its best time in ms"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    places = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(0)
+    cities = ["city-{}".format(i) for i in range(100)]
+    storage.all().clear()
+    storage.new_many([
+        Place(name="Place {}".format(i), city_id=random.choice(cities),
+              price_by_night=random.randrange(20, 400),
+              number_rooms=random.randrange(1, 6),
+              number_bathrooms=random.randrange(1, 4),
+              max_guest=random.randrange(1, 10))
+        for i in range(places)])
+    queries = [
+        ('price 100-104', {'price_by_night >=': 100,
+                           'price_by_night <': 105}, None, None),
+        ('10 cheapest', {}, 'price_by_night', 10),
+        ('10 cheapest 6+', {'max_guest >=': 6}, 'price_by_night', 10),
+        ('10 largest', {'price_by_night <=': 150}, '-number_rooms', 10),
+        ('20 in city', {'city_id': cities[0], 'number_bathrooms >': 1},
+         'price_by_night', 20),
+    ]
+    print("{:>16}  {:>7}  {:>11}  {:>11}  {:>11}".format(
+        'query', 'found', 'scan', 'build', 'index'))
+    for name, where, order_by, limit in queries:
+        expected, scan = timed(lambda: select(
+            storage.all(Place).values(), where, order_by, limit))
+        _, build = timed(lambda: storage.query(
+            Place, where, order_by, limit), 1)
+        result, index = timed(lambda: storage.query(
+            Place, where, order_by, limit))
+        field = (order_by or 'id').lstrip('-')
+        assert sorted(getattr(p, field) for p in result) == sorted(
+            getattr(p, field) for p in expected)
+        print("{:>16}  {:7d}  {:8.1f} ms  {:8.1f} ms  {:8.3f} ms".format(
+            name, len(result), scan, build, index))
@@ -173,11 +173,11 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        key = c_name + "." + c_id
-        try:
-            print(storage._FileStorage__objects[key])
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+        else:
+            print(obj)
 
     def help_show(self):
         """ Help information for the show command """
@@ -204,14 +204,12 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        key = c_name + "." + c_id
-
-        try:
-            obj = storage.all()[key]
-            storage.delete(obj)
-            storage.save()
-        except KeyError:
+        obj = storage.get(HBNBCommand.classes[c_name], c_id)
+        if obj is None:
             print("** no instance found **")
+            return
+        storage.delete(obj)
+        storage.save()
 
     def help_destroy(self):
         """ Help information for the destroy command """
@@ -220,34 +218,59 @@ class HBNBCommand(cmd.Cmd):
 
     def do_all(self, args):
         """ Shows all objects, or all objects of a class"""
-        print_list = []
+        cls = None
+        args = args.split()
+        options = {}
 
         if args:
-            args = args.split(' ')[0]  # remove possible trailing args
-            if args not in HBNBCommand.classes:
+            c_name = args.pop(0)
+            if c_name not in HBNBCommand.classes:
                 print("** class doesn't exist **")
                 return
-            for k, v in storage.all(HBNBCommand.classes[args]).items():
-                if k.split('.')[0] == args:
-                    print_list.append(v)
-        else:
-            for k, v in storage.all().items():
-                print_list.append(v)
+            cls = HBNBCommand.classes[c_name]
+            # remaining args are options; anything else is ignored
+            while args:
+                option = args.pop(0)
+                if option in ('--limit', '--after') and args:
+                    options[option] = args.pop(0)
+
+        if options:
+            limit = options.get('--limit')
+            if limit is not None:
+                if not limit.isdigit() or int(limit) == 0:
+                    print("** invalid limit **")
+                    return
+                limit = int(limit)
+            try:
+                objects, after = storage.page(cls, limit,
+                                              options.get('--after'))
+            except ValueError:
+                print("** invalid cursor **")
+                return
+            print(objects)
+            if after is not None:
+                print("--after {}".format(after))
+            return
 
-        print(print_list)
+        # printed as a list, one object at a time
+        print("[", end="")
+        for i, obj in enumerate(storage.iter(cls)):
+            print(", " if i else "", repr(obj), sep="", end="")
+        print("]")
 
     def help_all(self):
         """ Help information for the all command """
         print("Shows all objects, or all of a class")
-        print("[Usage]: all <className>\n")
+        print("[Usage]: all <className> [--limit N] [--after <cursor>]")
+        print("A page of N objects ends with the --after option that "
+              "shows the next one\n")
 
     def do_count(self, args):
         """Count current number of class instances"""
-        count = 0
-        for k, v in storage._FileStorage__objects.items():
-            if args == k.split('.')[0]:
-                count += 1
-        print(count)
+        if args in HBNBCommand.classes:
+            print(storage.count(HBNBCommand.classes[args]))
+        else:
+            print(0)
 
     def help_count(self):
         """ """
@@ -276,11 +299,9 @@ class HBNBCommand(cmd.Cmd):
             print("** instance id missing **")
             return
 
-        # generate key from class and id
-        key = c_name + "." + c_id
-
-        # determine if key is present
-        if key not in storage.all():
+        # retrieve the object to update
+        new_dict = storage.get(HBNBCommand.classes[c_name], c_id)
+        if new_dict is None:
             print("** no instance found **")
             return
 
@@ -313,9 +334,6 @@ class HBNBCommand(cmd.Cmd):
 
             args = [att_name, att_val]
 
-        # retrieve dictionary of current objects
-        new_dict = storage.all()[key]
-
         # iterate through attr names and values
         for i, att_name in enumerate(args):
             # block only runs on even iterations
@@ -3,9 +3,12 @@
 from os import getenv
 
 
-if getenv("HBNB_TYPE_STORAGE") == "db":
+if getenv("HBNB_TYPE_STORAGE") in ("db", "sqlite"):
     from models.engine.db_storage import DBStorage
     storage = DBStorage()
+elif getenv("HBNB_TYPE_STORAGE") == "mmap":
+    from models.engine.mmap_storage import MMapStorage
+    storage = MMapStorage()
 else:
     from models.engine.file_storage import FileStorage
     storage = FileStorage()
@@ -4,13 +4,14 @@ Defines the Amenity class for the HBNB project,
 representing amenities available in places.
 """
 from models.base_model import BaseModel, Base
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlalchemy.orm import relationship
 from os import getenv
 
 
 class Amenity(BaseModel, Base):
     __tablename__ = 'amenities'
+    __table_args__ = (Index('ix_amenities_name_id', 'name', 'id'),)
     name = Column(String(128), nullable=False)
     place_amenities = relationship('Place', secondary='place_amenity',
                                    viewonly=False)
@@ -1,9 +1,9 @@
 #!/usr/bin/python3
 """This module defines a base class for all models in our hbnb clone"""
-import uuid
 from datetime import datetime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, String, DateTime
+from models.engine.model_codecs import codec_of
 
 Base = declarative_base()
 
@@ -16,29 +16,13 @@ class BaseModel:
 
     def __init__(self, *args, **kwargs):
         """Instatntiates a new model"""
-        if not kwargs:
-            self.id = str(uuid.uuid4())
-            self.created_at = datetime.now()
-            self.updated_at = datetime.now()
-        else:
-            if 'id' not in kwargs:
-                self.id = str(uuid.uuid4())
-            if 'created_at' not in kwargs:
-                self.created_at = datetime.now()
-            if 'updated_at' not in kwargs:
-                self.updated_at = datetime.now()
-            for key, value in kwargs.items():
-                if key == "created_at" or key == "updated_at":
-                    setattr(self, key, datetime.fromisoformat(value))
-                elif key != "__class__":
-                    setattr(self, key, value)
+        codec_of(type(self)).hydrate(self, kwargs)
 
     def __str__(self):
         """Returns a string representation of the instance"""
-        cls = (str(type(self)).split('.')[-1]).split('\'')[0]
         dict_copy = {k: v for k, v in self.__dict__.items() if k !=
                      '_sa_instance_state'}
-        return '[{}] ({}) {}'.format(cls, self.id, dict_copy)
+        return '[{}] ({}) {}'.format(type(self).__name__, self.id, dict_copy)
 
     def __repr__(self):
         """Returns a string representation of the instance for debugging"""
@@ -53,16 +37,7 @@ class BaseModel:
 
     def to_dict(self):
         """Convert instance into dict format"""
-        dictionary = {}
-        dictionary.update(self.__dict__)
-        dictionary.update({'__class__':
-                          (str(type(self)).split('.')[-1]).split('\'')[0]})
-        if 'created_at' in dictionary:
-            dictionary['created_at'] = self.created_at.isoformat()
-        if 'updated_at' in dictionary:
-            dictionary['updated_at'] = self.updated_at.isoformat()
-        dictionary.pop("_sa_instance_state", None)
-        return dictionary
+        return codec_of(type(self)).to_dict(self)
 
     def delete(self):
         """Deletes the current instance from the storage"""
@@ -0,0 +1,355 @@
+#!/usr/bin/python3
+"""This module defines the column store behind scans of Place and Review
+
+query() and aggregate() take where dicts whose keys are a field name,
+optionally followed by a space and one of the operators in OPERATORS:
+{'city_id': id, 'price_by_night <': 100, 'number_rooms >=': 3}.
+
+A ColumnStore keeps a few numeric and foreign key fields of every object
+of a class in arrays, one slot per row, with the ids dictionary-encoded
+as integer codes. A condition is tested by one C loop over its array
+that yields a byte mask, masks are combined as big integers and the
+matching rows or values are picked with itertools.compress(), so no
+Python code runs per object.
+"""
+import math
+import operator
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from sqlalchemy import Float, Integer
+from models.engine.model_codecs import codec_of
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt,
+    '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    'in': lambda value, values: value in values,
+}
+AGGREGATES = ('count', 'sum', 'min', 'max', 'avg')
+MAX_INT = 2 ** 53
+
+
+def conditions(where):
+    """Returns the (field, operator, value) conditions of a where dict
+
+    Raises ValueError for an unknown operator.
+    """
+    result = []
+    for key, value in (where or {}).items():
+        field, _, op = key.partition(' ')
+        op = op.strip() or '=='
+        if op not in OPERATORS:
+            raise ValueError('Unknown operator: ' + key)
+        result.append((field, op, value))
+    return result
+
+
+def matches(obj, conds):
+    """Tells if obj meets every condition
+
+    As in SQL, a None attribute only meets '=='.
+    """
+    for field, op, value in conds:
+        attr = getattr(obj, field, None)
+        if attr is None and op != '==':
+            return False
+        if not OPERATORS[op](attr, value):
+            return False
+    return True
+
+
+def reduce_values(op, values):
+    """Returns the op aggregate of a list of values, as SQL would
+
+    Raises ValueError for an unknown aggregate.
+    """
+    if op == 'count':
+        return len(values)
+    if op not in AGGREGATES:
+        raise ValueError('Unknown aggregate: ' + op)
+    if not values:
+        return None
+    if op == 'sum':
+        return sum(values)
+    if op == 'avg':
+        return sum(values) / len(values)
+    return min(values) if op == 'min' else max(values)
+
+
+def aggregate_objects(objects, op, field=None, where=None, group_by=None):
+    """Aggregates field over the objects meeting where, by scanning them
+
+    op is one of AGGREGATES; count without a field counts objects, and
+    None values are skipped otherwise. With group_by, a dict of the
+    result for each value of that field is returned.
+    """
+    conds = conditions(where)
+    if op not in AGGREGATES:
+        raise ValueError('Unknown aggregate: ' + op)
+    groups = {}
+    for obj in objects:
+        if conds and not matches(obj, conds):
+            continue
+        values = groups.setdefault(
+            getattr(obj, group_by, None) if group_by else None, [])
+        value = getattr(obj, field, None) if field else True
+        if value is not None:
+            values.append(value)
+    if group_by:
+        return {group: reduce_values(op, values)
+                for group, values in groups.items()}
+    return reduce_values(op, groups.get(None, []))
+
+
+class ColumnStore:
+    """Numeric and foreign key fields of the objects of one class
+
+    Numbers are kept as doubles, NaN standing for None, and other fields
+    as codes into the list of their distinct values, -1 standing for
+    None. Objects with a value that fits neither, such as a number given
+    as a string, are listed in odd and left out of every result, and
+    supports() is False while there are any. Rows of deleted objects are
+    reused.
+    """
+
+    def __init__(self, cls, fields):
+        """Initialize an empty store of the fields of cls"""
+        columns = codec_of(cls).columns
+        self.numbers = {}
+        self.codes = {}
+        self.integers = set()
+        for field in fields:
+            kind = columns[field].type
+            if isinstance(kind, (Integer, Float)):
+                self.numbers[field] = array('d')
+                if isinstance(kind, Integer):
+                    self.integers.add(field)
+            else:
+                self.codes[field] = array('q')
+        self.values = {field: [] for field in self.codes}
+        self.lookup = {field: {} for field in self.codes}
+        self.keys = []
+        self.rows = {}
+        self.live = bytearray()
+        self.free = []
+        self.odd = set()
+
+    def __len__(self):
+        """Returns the number of objects in the store"""
+        return len(self.rows)
+
+    def set(self, key, obj, assigned=None):
+        """Stores the fields of obj under key
+
+        assigned holds values that are about to replace those of obj.
+        """
+        row = self.rows.get(key)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+                self.keys[row] = key
+            else:
+                row = len(self.keys)
+                self.keys.append(key)
+                self.live.append(0)
+                for column in self.numbers.values():
+                    column.append(math.nan)
+                for column in self.codes.values():
+                    column.append(-1)
+            self.rows[key] = row
+            self.live[row] = 1
+        self.odd.discard(key)
+        state = obj.__dict__
+        for field, column in self.numbers.items():
+            if assigned and field in assigned:
+                value = assigned[field]
+            else:
+                value = state.get(field)
+            if value is None:
+                column[row] = math.nan
+            elif (type(value) is float and value == value or
+                    type(value) is int and -MAX_INT <= value <= MAX_INT):
+                column[row] = value
+            else:
+                column[row] = math.nan
+                self.odd.add(key)
+        for field, column in self.codes.items():
+            if assigned and field in assigned:
+                value = assigned[field]
+            else:
+                value = state.get(field)
+            if value is None:
+                column[row] = -1
+            elif isinstance(value, str):
+                code = self.lookup[field].get(value)
+                if code is None:
+                    code = self.lookup[field][value] = len(
+                        self.values[field])
+                    self.values[field].append(value)
+                column[row] = code
+            else:
+                column[row] = -1
+                self.odd.add(key)
+
+    def drop(self, key):
+        """Removes the row of key, if it has one"""
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.odd.discard(key)
+        self.keys[row] = None
+        self.live[row] = 0
+        for column in self.numbers.values():
+            column[row] = math.nan
+        for column in self.codes.values():
+            column[row] = -1
+        self.free.append(row)
+
+    def select(self, conds):
+        """Returns the keys of the rows that meet every condition
+
+        Every field of conds must be one of the store.
+        """
+        return list(compress(self.keys, self.__mask(conds)))
+
+    def aggregate(self, op, field=None, conds=(), group_by=None):
+        """Aggregates field over the rows that meet conds
+
+        See aggregate_objects() for the arguments; field and group_by
+        must be fields of the store.
+        """
+        if op not in AGGREGATES:
+            raise ValueError('Unknown aggregate: ' + op)
+        mask = self.__mask(conds)
+        present = mask
+        if field is not None:
+            present = self.__and(mask, self.__present(field))
+        if group_by is None:
+            if op == 'count':
+                return present.count(1)
+            return self.__reduce(op, field, compress(self.numbers[field],
+                                                     present))
+        if group_by in self.codes:
+            column = self.codes[group_by]
+            name = self.__name(group_by)
+        else:
+            column = self.numbers[group_by]
+            name = self.__number(group_by)
+        # every group is listed, even one where field is always None
+        result = dict.fromkeys(map(name, set(compress(column, mask))),
+                               0 if op == 'count' else None)
+        if op == 'count':
+            for group, count in Counter(compress(column, present)).items():
+                result[name(group)] += count
+            return result
+        grouped = {}
+        for group, value in zip(compress(column, present),
+                                compress(self.numbers[field], present)):
+            grouped.setdefault(name(group), []).append(value)
+        for key, values in grouped.items():
+            result[key] = self.__reduce(op, field, values)
+        return result
+
+    def supports(self, conds=(), op='count', field=None, group_by=None):
+        """Tells if select() or aggregate() can answer from the store"""
+        fields = [item[0] for item in conds] + [group_by, field]
+        return (not self.odd and
+                all(item is None or item in self.numbers or
+                    item in self.codes for item in fields) and
+                (field is None or op == 'count' or field in self.numbers))
+
+    def __mask(self, conds):
+        """Returns the byte mask of the live rows that meet conds
+
+        Equalities go first, as they tend to keep the fewest rows; once
+        a 32nd of the rows or less is left, the other conditions are
+        only tested on those.
+        """
+        mask = bytes(self.live)
+        conds = sorted(conds, key=lambda cond: cond[1] not in ('==', 'in'))
+        for number, (field, op, value) in enumerate(conds):
+            if mask.count(1) <= len(mask) // 32:
+                return self.__narrow(mask, conds[number:])
+            column = self.numbers.get(field, self.codes.get(field))
+            mask = self.__and(mask, self.__test(field, op, value, column))
+        return mask
+
+    def __narrow(self, mask, conds):
+        """Returns mask without the rows that fail conds, row by row"""
+        rows = list(compress(range(len(mask)), mask))
+        for field, op, value in conds:
+            column = self.numbers.get(field, self.codes.get(field))
+            values = list(map(column.__getitem__, rows))
+            rows = list(compress(rows, self.__test(field, op, value,
+                                                   values)))
+        mask = bytearray(len(mask))
+        for row in rows:
+            mask[row] = 1
+        return bytes(mask)
+
+    def __test(self, field, op, value, values):
+        """Returns the byte mask of the stored values of field that meet
+        the condition of op and value
+        """
+        if value is None and op in ('==', '!='):
+            if field in self.numbers:
+                test = operator.eq if op == '!=' else operator.ne
+                return bytes(map(test, values, values))
+            test = operator.ne if op == '!=' else operator.eq
+            return bytes(map(test, values, repeat(-1)))
+        if field in self.numbers:
+            if op == 'in':
+                return bytes(map(set(value).__contains__, values))
+            test = bytes(map(OPERATORS[op], values, repeat(value)))
+            if op == '!=':
+                test = self.__and(test, bytes(map(operator.eq, values,
+                                                  values)))
+            return test
+        if op == '==':
+            return bytes(map(operator.eq, values, repeat(
+                self.lookup[field].get(value, -2))))
+        wanted = {code for code, item in enumerate(self.values[field])
+                  if OPERATORS[op](item, value)}
+        return bytes(map(wanted.__contains__, values))
+
+    def __present(self, field, present=True):
+        """Returns the byte mask of the rows where field is not None
+
+        With present False, the mask of the rows where it is None.
+        """
+        if field in self.numbers:
+            column = self.numbers[field]
+            test = operator.eq if present else operator.ne
+            return bytes(map(test, column, column))
+        test = operator.ne if present else operator.eq
+        return bytes(map(test, self.codes[field], repeat(-1)))
+
+    def __reduce(self, op, field, values):
+        """Aggregates numbers of field, keeping integer fields integers"""
+        values = list(values)
+        if op == 'count':
+            return len(values)
+        if op == 'sum' and values:
+            total = math.fsum(values)
+            return int(total) if field in self.integers else total
+        result = reduce_values(op, values)
+        if op in ('min', 'max') and field in self.integers and values:
+            return int(result)
+        return result
+
+    def __number(self, field):
+        """Returns the function that turns a stored number of field back"""
+        convert = int if field in self.integers else float
+        return lambda number: None if number != number else convert(number)
+
+    def __name(self, field):
+        """Returns the function that turns a code of field back"""
+        values = self.values[field]
+        return lambda code: None if code == -1 else values[code]
+
+    @staticmethod
+    def __and(first, second):
+        """Returns the byte mask of the rows set in both masks"""
+        return (int.from_bytes(first, 'little') &
+                int.from_bytes(second, 'little')).to_bytes(
+                    len(first), 'little')
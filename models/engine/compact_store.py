@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""This module defines the column store FileStorage keeps unbuilt records in
+
+With HBNB_FILE_COMPACT=1, records read from the file are kept in one
+CompactTable per class until the storage API hands their objects out,
+instead of as model objects with their own __dict__, dates and
+SQLAlchemy state. Each column of the class is an array of the rows:
+DateTime columns hold microseconds since 1970 and Integer and Float
+columns machine numbers, in array.array, and a foreign key stores one
+shared string per distinct id. The other String columns of a row are
+packed into a single string, each value led by SEP and marked present
+by a PRESENT character. The id comes from the key. Values that do not
+fit their column, and attributes that are not columns, are kept aside
+per row.
+"""
+import array
+import math
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, Float, Integer
+from models.engine.model_codecs import codec_of
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NO_INT = -2 ** 63
+NO_VALUE = object()
+SEP = '\x00'
+PRESENT = '\x01'
+
+
+class CompactTable(MutableMapping):
+    """Maps the keys of one class to their record dicts, stored by column
+
+    Records go in as the dicts read from the file and come out as dicts
+    holding the same values, dates as datetime objects.
+    """
+
+    def __init__(self, cls):
+        """Initialize an empty table for the columns of cls"""
+        self.cls_name = cls.__name__
+        self.kinds = {}
+        for name, column in codec_of(cls).columns.items():
+            if name == 'id':
+                continue
+            if isinstance(column.type, DateTime):
+                self.kinds[name] = 'datetime'
+            elif isinstance(column.type, Integer):
+                self.kinds[name] = 'int'
+            elif isinstance(column.type, Float):
+                self.kinds[name] = 'float'
+            elif column.foreign_keys:
+                self.kinds[name] = 'ref'
+            else:
+                self.kinds[name] = 'str'
+        self.clear()
+
+    def clear(self):
+        """Drops every row and the memory of the columns"""
+        self.rows = {}
+        self.size = 0
+        self.free = []
+        self.extras = {}
+        self.shared = {}
+        self.texts = []
+        self.columns = {
+            name: (array.array('d') if kind == 'float' else
+                   array.array('q') if kind in ('datetime', 'int') else [])
+            for name, kind in self.kinds.items() if kind != 'str'}
+
+    def __len__(self):
+        """Returns the number of rows"""
+        return len(self.rows)
+
+    def __iter__(self):
+        """Iterates over the keys of the rows"""
+        return iter(self.rows)
+
+    def __contains__(self, key):
+        """Tells if key has a row, without building its record"""
+        return key in self.rows
+
+    def __getitem__(self, key):
+        """Returns the record dict of key"""
+        row = self.rows[key]
+        record = {'id': key.partition('.')[2]}
+        texts = iter(self.texts[row].split(SEP)[1:])
+        for name, kind in self.kinds.items():
+            if kind == 'str':
+                value = next(texts)
+                if value:
+                    record[name] = value[1:]
+                continue
+            value = self.columns[name][row]
+            if kind == 'datetime':
+                if value != NO_INT:
+                    record[name] = EPOCH + value * MICROSECOND
+            elif kind == 'int':
+                if value != NO_INT:
+                    record[name] = value
+            elif kind == 'float':
+                if not math.isnan(value):
+                    record[name] = value
+            elif value is not NO_VALUE:
+                record[name] = value
+        record.update(self.extras.get(row, ()))
+        record['__class__'] = self.cls_name
+        return record
+
+    def __setitem__(self, key, record):
+        """Stores the record dict of key, replacing its row if it has one"""
+        row = self.rows.get(key)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                row = self.size
+                self.size += 1
+                self.texts.append('')
+                for name, kind in self.kinds.items():
+                    if kind != 'str':
+                        self.columns[name].append(
+                            math.nan if kind == 'float' else
+                            NO_VALUE if kind == 'ref' else NO_INT)
+            self.rows[key] = row
+        extra = {}
+        for name, value in record.items():
+            if name == '__class__' or name in self.kinds:
+                continue
+            if name != 'id' or value != key.partition('.')[2]:
+                extra[name] = value
+        texts = []
+        for name, kind in self.kinds.items():
+            value = record.get(name, NO_VALUE)
+            stored = self.__encode(kind, value)
+            if stored is NO_VALUE and value is not NO_VALUE:
+                extra[name] = value
+                stored = self.__encode(kind, NO_VALUE)
+            if kind == 'str':
+                texts.append(SEP if stored is NO_VALUE else stored)
+            else:
+                self.columns[name][row] = stored
+        self.texts[row] = ''.join(texts)
+        if extra:
+            self.extras[row] = extra
+        else:
+            self.extras.pop(row, None)
+
+    def __delitem__(self, key):
+        """Drops the row of key"""
+        row = self.rows.pop(key)
+        if not self.rows:
+            self.clear()
+            return
+        self.extras.pop(row, None)
+        self.texts[row] = ''
+        for name, kind in self.kinds.items():
+            if kind == 'ref':
+                self.columns[name][row] = NO_VALUE
+        self.free.append(row)
+
+    def __encode(self, kind, value):
+        """Returns what the column of kind stores for value
+
+        NO_VALUE means the value does not fit the column; for a missing
+        value, that is NO_VALUE itself, the empty slot is returned.
+        """
+        if kind == 'datetime':
+            if value is NO_VALUE:
+                return NO_INT
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value)
+                except ValueError:
+                    return NO_VALUE
+            if type(value) is not datetime or value.tzinfo is not None:
+                return NO_VALUE
+            return (value - EPOCH) // MICROSECOND
+        if kind == 'int':
+            if value is NO_VALUE:
+                return NO_INT
+            if type(value) is not int or not NO_INT < value < -NO_INT:
+                return NO_VALUE
+            return value
+        if kind == 'float':
+            if value is NO_VALUE:
+                return math.nan
+            if type(value) is not float or math.isnan(value):
+                return NO_VALUE
+            return value
+        if value is NO_VALUE or type(value) is not str:
+            return NO_VALUE
+        if kind == 'ref':
+            return self.shared.setdefault(value, value)
+        if SEP in value:
+            return NO_VALUE
+        return SEP + PRESENT + value
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+"""This module defines the cursors used for keyset pagination
+
+A page lists objects ordered by (field, id) and hands out a cursor, an
+opaque string holding the field, value and id of its last object. The
+next page starts right after that position, so an index can seek to it
+and a deep page costs no more than the first one. sort_range() seeks to
+the entries of such an index that fall in a range of values.
+"""
+import base64
+import bisect
+import heapq
+import json
+from datetime import datetime
+from operator import itemgetter
+from sqlalchemy import DateTime
+
+
+def page_field(cls):
+    """Returns the field objects of cls are paged by by default"""
+    return 'name' if hasattr(cls, 'name') else 'created_at'
+
+
+def encode_cursor(obj, field):
+    """Returns the cursor of the position of obj in the field order"""
+    value = getattr(obj, field, None)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    data = json.dumps([field, value, obj.id]).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, cls, field):
+    """Returns the (value, id) position held by a cursor of cls by field
+
+    Raises ValueError if cursor is not such a cursor.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, value, id = json.loads(data)
+        if name != field or not isinstance(id, str):
+            raise ValueError
+        column = getattr(cls, field, None)
+        if value is not None and isinstance(getattr(column, 'type', None),
+                                            DateTime):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor: ' + cursor) from None
+    return value, id
+
+
+def sort_entry(value, id):
+    """Returns the sort key of a (value, id) position; None sorts first"""
+    return (0, '', id) if value is None else (1, value, id)
+
+
+class Last:
+    """An id that sorts after every other, to seek past a value"""
+
+    def __lt__(self, other):
+        """Nothing sorts after it"""
+        return False
+
+    def __gt__(self, other):
+        """Everything sorts before it"""
+        return True
+
+
+LAST = Last()
+RANGE_OPERATORS = ('==', '<', '<=', '>', '>=')
+
+
+def sort_range(index, bounds):
+    """Returns the (start, stop) slice of a sorted list of sort entries
+    whose values meet bounds
+
+    bounds are (operator, value) pairs with an operator from
+    RANGE_OPERATORS; as in SQL, None values never meet them.
+    """
+    start = bisect.bisect_left(index, (1,))
+    stop = len(index)
+    for op, value in bounds:
+        if op in ('==', '>', '>='):
+            entry = (1, value, LAST) if op == '>' else (1, value)
+            start = max(start, bisect.bisect_left(index, entry))
+        if op in ('==', '<', '<='):
+            entry = (1, value) if op == '<' else (1, value, LAST)
+            stop = min(stop, bisect.bisect_left(index, entry))
+    return start, max(start, stop)
+
+
+def page_of(objects, cls, limit=None, after=None, field=None):
+    """Returns the page of objects of cls following after, and its cursor
+
+    This is keyset pagination by a scan, for engines with no index on
+    field; objects may come in any order. The cursor of the next page is
+    None when this page is the last one.
+    """
+    field = field or page_field(cls)
+    entries = ((sort_entry(getattr(obj, field, None), obj.id), obj)
+               for obj in objects)
+    if after is not None:
+        start = sort_entry(*decode_cursor(after, cls, field))
+        entries = (entry for entry in entries if entry[0] > start)
+    if limit is None:
+        entries = sorted(entries, key=itemgetter(0))
+    else:
+        entries = heapq.nsmallest(limit + 1, entries, key=itemgetter(0))
+    return split_page([obj for _, obj in entries], limit, field)
+
+
+def split_page(rows, limit, field):
+    """Returns a page and the cursor after it, or None if it is the last
+
+    rows are read with one more than limit, so that a last page that is
+    exactly full is told apart from one with more objects after it.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1], field) if page else None
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+"""This module defines the on-disk formats FileStorage can read and write
+
+A codec turns the records of a storage file into (key, raw, dict) triples
+and back. raw is the compact form FileStorage keeps for records it has
+not turned into objects yet, and compares to spot changed records; the
+dict may be None when the codec can decode raw later with loads().
+
+Usage: python3 -m models.engine.file_codecs <source> <destination>
+"""
+import json
+import struct
+import sys
+from datetime import datetime
+from os import getenv
+
+
+class JSONCodec:
+    """The original file.json format: one JSON object of key: dict"""
+    binary = False
+
+    def dumps(self, val):
+        """Returns the raw JSON text of a record dict"""
+        return json.dumps(val, default=datetime.isoformat)
+
+    def loads(self, raw, cls_name):
+        """Returns the record dict of raw JSON text"""
+        return json.loads(raw)
+
+    def records(self, f, seen):
+        """Yields the (key, text, dict) records of a JSON object file
+
+        Only a chunk of the file and the current record are held in memory.
+        Every key read is added to seen.
+        """
+        decoder = json.JSONDecoder()
+        buf, pos, eof = '', 0, False
+        expect, key = '{', None
+        after = {'{': 'first', ':': 'value', ',': 'key'}
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\n\r':
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise json.JSONDecodeError('Unexpected end', buf, pos)
+                chunk = f.read(1 << 16)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            char = buf[pos]
+            if char == '}' and expect in ('first', ','):
+                return
+            if expect in after:
+                if char != expect:
+                    raise json.JSONDecodeError(
+                        'Expecting ' + repr(expect), buf, pos)
+                pos += 1
+                expect = after[expect]
+                continue
+            try:
+                val, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(1 << 16)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            if expect == 'value':
+                yield key, buf[pos:end], val
+                expect = ','
+            else:
+                key = val
+                seen.add(key)
+                expect = ':'
+            pos = end
+
+    def write(self, f, items):
+        """Writes (key, text) records as one JSON object"""
+        sep = ''
+        f.write('{')
+        for key, raw in items:
+            f.write(sep + json.dumps(key) + ': ' + raw)
+            sep = ', '
+        f.write('}')
+
+
+class BinaryCodec:
+    """A compact format of length-prefixed records
+
+    The file starts with MAGIC and holds (class index, length) headers
+    each followed by that many payload bytes. A header whose index is
+    NEW_CLASS carries the name of the next class index instead of a
+    record, so every class name is stored once. A payload is created_at
+    and updated_at packed as integers (year 0 when unset), the id, then
+    the other fields as compact UTF-8 JSON. Version 1 files, which held
+    those fields in marshal format, are not read.
+    """
+    binary = True
+    MAGIC = b'HBNB\x02'
+    NEW_CLASS = 0xFFFF
+    header = struct.Struct('<HI')
+    fixed = struct.Struct('<HBBBBBIHBBBBBIB')
+    unset = (0, 1, 1, 0, 0, 0, 0)
+
+    def dumps(self, val):
+        """Returns the raw payload bytes of a record dict"""
+        val = dict(val)
+        val.pop('__class__', None)
+        parts = []
+        for name in ('created_at', 'updated_at'):
+            date = val.pop(name, None)
+            if date is None:
+                parts.extend(self.unset)
+                continue
+            if isinstance(date, str):
+                date = datetime.fromisoformat(date)
+            parts.extend((date.year, date.month, date.day, date.hour,
+                          date.minute, date.second, date.microsecond))
+        obj_id = val.pop('id').encode()
+        parts.append(len(obj_id))
+        return self.fixed.pack(*parts) + obj_id + json.dumps(
+            val, separators=(',', ':'), default=datetime.isoformat).encode()
+
+    def key(self, raw, cls_name):
+        """Returns the storage key of raw payload bytes"""
+        start = self.fixed.size
+        return cls_name + '.' + raw[start:start + raw[start - 1]].decode()
+
+    def loads(self, raw, cls_name):
+        """Returns the record dict of raw payload bytes"""
+        parts = self.fixed.unpack_from(raw)
+        start = self.fixed.size
+        val = json.loads(raw[start + parts[14]:])
+        if not isinstance(val, dict):
+            raise ValueError('Not a record payload')
+        val['id'] = raw[start:start + parts[14]].decode()
+        val['__class__'] = cls_name
+        if parts[0]:
+            val['created_at'] = datetime(*parts[0:7])
+        if parts[7]:
+            val['updated_at'] = datetime(*parts[7:14])
+        return val
+
+    def records(self, f, seen):
+        """Yields the (key, payload, None) records of a binary file
+
+        Payloads are not decoded here; loads() does that when needed.
+        Records are read one at a time, so only the current one is held
+        in memory.
+        """
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            raise ValueError('Not a binary hbnb storage file')
+        names = []
+        header = self.header
+        while True:
+            data = f.read(header.size)
+            if not data:
+                return
+            if len(data) < header.size:
+                raise ValueError('Truncated record header')
+            index, size = header.unpack(data)
+            raw = f.read(size)
+            if len(raw) < size:
+                raise ValueError('Truncated record')
+            if index == self.NEW_CLASS:
+                names.append(raw.decode())
+                continue
+            if index >= len(names):
+                raise ValueError('Unknown class index')
+            key = self.key(raw, names[index])
+            seen.add(key)
+            yield key, raw, None
+
+    def write(self, f, items):
+        """Writes (key, payload) records, interning their class names"""
+        indexes = {}
+        f.write(self.MAGIC)
+        for key, raw in items:
+            cls_name = key.partition('.')[0]
+            index = indexes.get(cls_name)
+            if index is None:
+                index = indexes[cls_name] = len(indexes)
+                name = cls_name.encode()
+                f.write(self.header.pack(self.NEW_CLASS, len(name)) + name)
+            f.write(self.header.pack(index, len(raw)) + raw)
+
+
+def codec_for(path):
+    """Returns the codec for path
+
+    HBNB_FILE_FORMAT (json or binary) wins over the file extension, and
+    only .bin files are binary by default.
+    """
+    fmt = getenv('HBNB_FILE_FORMAT')
+    if fmt is None:
+        fmt = 'binary' if path.endswith('.bin') else 'json'
+    return BinaryCodec() if fmt == 'binary' else JSONCodec()
+
+
+def convert(source, destination):
+    """Copies every record of source into destination
+
+    The format of each file follows its extension.
+    """
+    reader = (BinaryCodec() if source.endswith('.bin') else JSONCodec())
+    writer = (BinaryCodec() if destination.endswith('.bin')
+              else JSONCodec())
+    with open(source, 'rb' if reader.binary else 'r') as f:
+        items = [(key, writer.dumps(
+                     val or reader.loads(raw, key.partition('.')[0])))
+                 for key, raw, val in reader.records(f, set())]
+    with open(destination, 'wb' if writer.binary else 'w') as f:
+        writer.write(f, items)
+    return len(items)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: {} <source> <destination>".format(sys.argv[0]))
+        sys.exit(1)
+    print(convert(sys.argv[1], sys.argv[2]))
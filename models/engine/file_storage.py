@@ -1,66 +1,1074 @@
 #!/usr/bin/python3
 """This module defines a class to manage file storage for hbnb clone"""
+import atexit
+import bisect
+import heapq
 import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from os import getenv
+from types import MappingProxyType
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from models.engine.cursors import decode_cursor, page_field, split_page
+from models.engine.cursors import RANGE_OPERATORS, sort_entry, sort_range
+from models.engine.column_store import aggregate_objects, conditions
+from models.engine.column_store import ColumnStore, matches
+from models.engine.compact_store import CompactTable
+from models.engine.file_codecs import codec_for
+from models.engine.model_codecs import codec_of
+from models.engine.spatial import GeoGrid
+
+
+def select(objects, where=None, order_by=None, limit=None, offset=0):
+    """Filters, orders and pages an iterable of model objects
+
+    where maps attribute names to the values they must equal, or names
+    followed by an operator such as 'price_by_night <' to the value they
+    are compared with; see models.engine.column_store. order_by is an
+    attribute name or a sequence of them, prefixed with '-' to sort in
+    descending order; None sorts first. With a limit, only the first
+    offset + limit objects are kept while ordering, through a heap.
+    """
+    if where:
+        conds = conditions(where)
+        objects = (obj for obj in objects if matches(obj, conds))
+    stop = None if limit is None else offset + limit
+    if not order_by:
+        return list(islice(objects, offset, stop))
+    if isinstance(order_by, str):
+        order_by = (order_by,)
+    fields = [field.lstrip('-') for field in order_by]
+    reverse = [field.startswith('-') for field in order_by]
+
+    def key(obj):
+        values = (getattr(obj, field, None) for field in fields)
+        return tuple((value is not None, value) for value in values)
+
+    if all(reverse) or not any(reverse):
+        if stop is None:
+            result = sorted(objects, key=key, reverse=reverse[0])
+        elif reverse[0]:
+            result = heapq.nlargest(stop, objects, key=key)
+        else:
+            result = heapq.nsmallest(stop, objects, key=key)
+    else:
+        result = list(objects)
+        for field, desc in reversed(list(zip(fields, reverse))):
+            result.sort(key=lambda obj: (getattr(obj, field, None) is not
+                                         None, getattr(obj, field, None)),
+                        reverse=desc)
+        result = result[:stop]
+    return result[offset:]
+
+
+def assign(obj, row):
+    """Sets the attributes of obj from a dict, as BaseModel(**row) would
+
+    Dates may be given as ISO strings; updated_at defaults to now.
+    """
+    for field, value in row.items():
+        if field in ('created_at', 'updated_at') and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if field != '__class__':
+            setattr(obj, field, value)
+    if 'updated_at' not in row:
+        obj.updated_at = datetime.now()
 
 
 class FileStorage:
-    """This class manages storage of hbnb models in JSON format"""
-    __file_path = 'file.json'
+    """This class manages storage of hbnb models in JSON format
+
+    With HBNB_FILE_JOURNAL=1, save() appends the objects changed since the
+    last save to a journal next to the snapshot instead of rewriting it;
+    the journal is folded back into the snapshot once it grows past
+    __journal_limit bytes.
+
+    reload() reads file.json one record at a time and only re-reads the
+    files when their inode, size or mtime changed, rebuilding just the
+    records that differ from the ones read last time, so close() is cheap
+    between requests; only a hash of each record is kept for that. With
+    HBNB_FILE_LAZY=1 records are kept in their raw form and only turned
+    into objects when their class is first accessed.
+    HBNB_FILE_COMPACT=1 does the same with records kept column by column
+    in a CompactTable per class, see models.engine.compact_store.
+
+    The file format comes from HBNB_FILE_FORMAT or the extension of
+    HBNB_FILE_PATH; see models.engine.file_codecs.
+
+    With HBNB_FILE_SHARDED=1 each class lives in its own file, such as
+    file.State.json, read the first time the class is accessed; save()
+    only rewrites the files of classes with changed objects. The journal
+    is not used in this layout.
+
+    related() answers "which cities have this state_id" from reverse
+    indexes on the foreign keys in __ref_fields, kept up to date by new(),
+    delete() and assignments to those attributes. page() walks sorted
+    (field, id) indexes in __sorted, built the first time a class is paged
+    by a field and kept up to date the same way; query() uses those of
+    the fields with an Index on (field, id) in the __table_args__ of the
+    class, for ranges and ordered limits. So are the ColumnStores
+    in __columns that answer query() and aggregate() for the fields in
+    __column_fields, and the GeoGrid of places that answers nearby().
+
+    Keys passed to new() or delete(), and stored objects with a column
+    set, count as changed until the next write; a save() with none of
+    them writes nothing. Saves made inside batch(), or within
+    HBNB_FILE_COMMIT_DELAY seconds of each other, are flushed together
+    in one write.
+    """
+    __file_path = getenv('HBNB_FILE_PATH', 'file.json')
     __objects = {}
+    __by_class = {}
+    __indexed = 0
+    __pending = {}
+    __changed = set()
+    __lazy = getenv('HBNB_FILE_LAZY') == '1'
+    __compact = getenv('HBNB_FILE_COMPACT') == '1'
+    __journal = getenv('HBNB_FILE_JOURNAL') == '1'
+    __sharded = getenv('HBNB_FILE_SHARDED') == '1'
+    __shards = {}
+    __journal_limit = 4 * 1024 * 1024
+    __batch_depth = 0
+    __commit_delay = float(getenv('HBNB_FILE_COMMIT_DELAY', '0'))
+    __timer = None
+    __lock = threading.RLock()
+    __loaded = {}
+    __snapshot_stat = None
+    __journal_pos = (None, 0)
+    __classes = None
+    __ref_fields = {
+        'City': ('state_id',),
+        'Place': ('city_id', 'user_id', 'amenity_ids'),
+        'Review': ('place_id', 'user_id'),
+    }
+    __refs = {}
+    __ref_values = {}
+    __sorted = {}
+    __sort_listeners = set()
+    __sortable = {}
+    __column_fields = {
+        'Place': ('city_id', 'user_id', 'price_by_night', 'number_rooms',
+                  'max_guest', 'latitude', 'longitude'),
+        'Review': ('place_id', 'user_id'),
+    }
+    __columns = {}
+    __column_listeners = set()
+    __grid = None
+    __grid_listeners = set()
 
-    def all(self, cls=None):
-        """Returns a dictionary of models currently in storage"""
+    def all(self, cls=None, load=None):
+        """Returns a dictionary of models currently in storage
+
+        With a class, a read-only view of that class's index is returned
+        instead of a filtered copy of every object. Unlike the copy
+        returned before, the view follows new() and delete(), so a loop
+        that deletes objects must go over a snapshot, list(view.values())
+        or storage.iter(cls). load is accepted for compatibility with
+        DBStorage; relationships are always in memory.
+        """
         if cls is None:
+            if FileStorage.__sharded:
+                for cls_name in self.__models():
+                    if cls_name not in FileStorage.__shards:
+                        self.__load_shard(cls_name)
+            if any(FileStorage.__pending.values()):
+                self.__hydrate()
             return FileStorage.__objects
         cls_name = cls.__name__
-        return {k: v for k, v in
-                FileStorage.__objects.items() if k.startswith(cls_name)}
+        if FileStorage.__sharded and cls_name not in FileStorage.__shards:
+            self.__load_shard(cls_name)
+        if FileStorage.__pending.get(cls_name):
+            self.__hydrate(cls_name)
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        return MappingProxyType(
+            FileStorage.__by_class.setdefault(cls_name, {}))
+
+    def get(self, cls, id):
+        """Returns the object of cls with id, or None if there is none
+
+        A lazily loaded record is turned into an object on its own.
+        """
+        cls_name = cls.__name__
+        if FileStorage.__sharded and cls_name not in FileStorage.__shards:
+            self.__load_shard(cls_name)
+        key = cls_name + '.' + str(id)
+        obj = FileStorage.__objects.get(key)
+        if obj is None and key in FileStorage.__pending.get(cls_name, ()):
+            with FileStorage.__lock:
+                raw = FileStorage.__pending[cls_name].pop(key)
+                obj = self.__build(self.__decode(raw, cls_name))
+                self.__add(key, obj)
+        return obj
+
+    def count(self, cls=None):
+        """Returns the number of objects of cls, or of all objects"""
+        if cls is None:
+            if FileStorage.__sharded:
+                self.all()
+            return len(FileStorage.__objects) + sum(
+                len(pending) for pending in FileStorage.__pending.values())
+        cls_name = cls.__name__
+        if FileStorage.__sharded and cls_name not in FileStorage.__shards:
+            self.__load_shard(cls_name)
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        return (len(FileStorage.__by_class.get(cls_name, ())) +
+                len(FileStorage.__pending.get(cls_name, ())))
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """Returns the objects of cls matching where, ordered and paged
+
+        See select() for the arguments; load is ignored, as in all().
+        A limit ordered by a field with a sorted index, or a range on
+        such a field, is answered from that index. Conditions on the
+        fields of a column store are answered by it; otherwise an
+        equality on an indexed foreign key narrows the candidates to its
+        reverse index group first.
+        """
+        conds = conditions(where)
+        found = self.__sorted_query(cls, conds, order_by, limit, offset)
+        if found is not None:
+            return found
+        if conds:
+            objects = self.all(cls)
+            store = self.__column_store(cls.__name__)
+            if store is not None and store.supports(conds):
+                return select([objects[key] for key in store.select(conds)],
+                              None, order_by, limit, offset)
+        where = dict(where or {})
+        objects = None
+        for field in FileStorage.__ref_fields.get(cls.__name__, ()):
+            if field in where and field != 'amenity_ids':
+                objects = self.related(cls, field, where.pop(field)).values()
+                break
+        if objects is None:
+            objects = self.all(cls).values()
+        return select(objects, where, order_by, limit, offset)
+
+    def aggregate(self, cls, op='count', field=None, where=None,
+                  group_by=None):
+        """Returns the op aggregate of field over the objects of cls
+
+        op is count, sum, min, max or avg; count without a field counts
+        objects and None values are skipped otherwise. where is as in
+        query(). With group_by, a dict of the result for each value of
+        that field is returned, as SQL's GROUP BY would. The fields of a
+        column store are aggregated from its arrays.
+        """
+        conds = conditions(where)
+        objects = self.all(cls)
+        store = self.__column_store(cls.__name__)
+        if store is not None and store.supports(conds, op, field, group_by):
+            return store.aggregate(op, field, conds, group_by)
+        return aggregate_objects(objects.values(), op, field, where,
+                                 group_by)
+
+    def nearby(self, lat, lon, radius_km=None, limit=None):
+        """Returns the places near a point, with their distances in km
+
+        The (place, distance) pairs of the places within radius_km of
+        lat, lon come nearest first, at most limit of them; without a
+        radius, the limit nearest places are returned. The search reads
+        the cells of a grid of the places around the point, see
+        models.engine.spatial.
+        """
+        objects = self.all(self.__models()['Place'])
+        return [(objects[key], distance) for distance, key in
+                self.__geo_grid().search(lat, lon, radius_km, limit)]
+
+    def related(self, cls, field, value):
+        """Returns the objects of cls whose field holds value
+
+        For the fields in __ref_fields this is a read-only view of the
+        reverse index; any other field is answered by a scan.
+        """
+        objects = self.all(cls)
+        cls_name = cls.__name__
+        if field not in FileStorage.__ref_fields.get(cls_name, ()):
+            return {k: v for k, v in objects.items()
+                    if getattr(v, field, None) == value}
+        index = FileStorage.__refs.setdefault((cls_name, field), {})
+        return MappingProxyType(index.setdefault(value, {}))
+
+    def page(self, cls, limit=None, after=None, order_by=None, load=None):
+        """Returns up to limit objects of cls after a cursor, and the next
+
+        Objects are ordered by (order_by, id), order_by being one field
+        that defaults to name, or created_at for classes without one.
+        after is the cursor returned with the previous page, and the
+        cursor returned is None after the last page. The start of a page
+        is found by a binary search of the sorted index of the field, so
+        every page costs the same. load is ignored, as in all().
+        """
+        field = order_by or page_field(cls)
+        objects = self.all(cls)
+        index = self.__sorted_index(cls.__name__, field)
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(
+                index, sort_entry(*decode_cursor(after, cls, field)))
+        stop = len(index) if limit is None else start + limit + 1
+        rows = [objects[cls.__name__ + '.' + entry[2]]
+                for entry in index[start:stop]]
+        return split_page(rows, limit, field)
+
+    def iter(self, cls=None, batch_size=1000):
+        """Yields the objects of cls, or of every class, one at a time
+
+        Objects in memory come from a snapshot of their class index, so
+        the store may change during the scan. Records loaded lazily are
+        decoded one by one and not kept, so a full scan does not hydrate
+        the store. batch_size is accepted for compatibility with
+        DBStorage.
+        """
+        for name in [cls.__name__] if cls else list(self.__models()):
+            if FileStorage.__sharded and name not in FileStorage.__shards:
+                self.__load_shard(name)
+            if len(FileStorage.__objects) != FileStorage.__indexed:
+                self.__reindex()
+            yield from list(FileStorage.__by_class.get(name, {}).values())
+            with FileStorage.__lock:
+                keys = list(FileStorage.__pending.get(name, ()))
+            for key in keys:
+                obj = FileStorage.__objects.get(key)
+                if obj is not None:
+                    yield obj
+                    continue
+                with FileStorage.__lock:
+                    raw = FileStorage.__pending.get(name, {}).get(key)
+                if raw is not None:
+                    yield self.__build(self.__decode(raw, name))
 
     def new(self, obj):
         """Adds new object to storage dictionary"""
-        self.all().update({obj.to_dict()['__class__'] + '.' + obj.id: obj})
+        key = obj.__class__.__name__ + '.' + obj.id
+        with FileStorage.__lock:
+            self.__add(key, obj)
+            FileStorage.__changed.add(key)
+
+    def new_many(self, objs):
+        """Adds every object of objs to storage, as new() does"""
+        for obj in objs:
+            self.new(obj)
+
+    def bulk_upsert(self, cls, rows):
+        """Creates or updates objects of cls from dicts of attributes
+
+        A row with the id of a stored object updates it; any other row
+        creates an object. All of them are written by a single save()
+        at the end. Returns the number of rows.
+        """
+        objects = self.all(cls)
+        count = 0
+        with self.batch():
+            for row in rows:
+                obj = objects.get(cls.__name__ + '.' + str(row.get('id')))
+                if obj is None:
+                    obj = cls(**row)
+                else:
+                    assign(obj, row)
+                self.new(obj)
+                count += 1
+        return count
 
     def save(self):
         """Saves storage dictionary to file"""
-        with open(FileStorage.__file_path, 'w') as f:
-            temp = {}
-            temp.update(FileStorage.__objects)
-            for key, val in temp.items():
-                temp[key] = val.to_dict()
-            json.dump(temp, f)
+        if FileStorage.__batch_depth:
+            return
+        if FileStorage.__commit_delay > 0:
+            with FileStorage.__lock:
+                if FileStorage.__timer is None:
+                    FileStorage.__timer = threading.Timer(
+                        FileStorage.__commit_delay, self.__flush)
+                    FileStorage.__timer.daemon = True
+                    FileStorage.__timer.start()
+                    atexit.register(self.__flush)
+            return
+        self.__flush()
+
+    @contextmanager
+    def batch(self):
+        """Defers every save() inside the block to one write at its end"""
+        FileStorage.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            FileStorage.__batch_depth -= 1
+            if not FileStorage.__batch_depth:
+                self.__flush()
 
     def reload(self):
         """Loads storage dictionary from file"""
-        from models.base_model import BaseModel
-        from models.user import User
-        from models.place import Place
-        from models.state import State
-        from models.city import City
-        from models.amenity import Amenity
-        from models.review import Review
-
-        classes = {
-                    'BaseModel': BaseModel, 'User': User, 'Place': Place,
-                    'State': State, 'City': City, 'Amenity': Amenity,
-                    'Review': Review
-                  }
-        try:
-            temp = {}
-            with open(FileStorage.__file_path, 'r') as f:
-                temp = json.load(f)
-                for key, val in temp.items():
-                    self.all()[key] = classes[val['__class__']](**val)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
+        self.__models()
+        with FileStorage.__lock:
+            if len(FileStorage.__objects) != FileStorage.__indexed:
+                # __objects was edited directly, so nothing can be trusted
+                FileStorage.__snapshot_stat = None
+                FileStorage.__loaded = {}
+                FileStorage.__journal_pos = (None, 0)
+                FileStorage.__shards = {}
+            if FileStorage.__sharded:
+                for cls_name in list(FileStorage.__shards):
+                    self.__load_shard(cls_name)
+                return
+            stat = self.__stat(FileStorage.__file_path)
+            if stat is not None and stat != FileStorage.__snapshot_stat:
+                FileStorage.__snapshot_stat = stat
+                if self.__read(FileStorage.__file_path):
+                    FileStorage.__journal_pos = (None, 0)
+            self.__replay()
 
     def delete(self, obj=None):
         """Delete obj from __objects if it’s inside"""
         if obj is None:
             return
         obj_key = f"{obj.__class__.__name__}.{obj.id}"
-        if obj_key in self.__objects:
-            del self.__objects[obj_key]
+        with FileStorage.__lock:
+            if obj_key in self.__objects:
+                self.__remove(obj_key)
+                FileStorage.__changed.add(obj_key)
 
     def close(self):
         """Call reload() method for deserializing the JSON file to objects"""
         self.reload()
+
+    def __models(self):
+        """Returns the model classes by the name stored in __class__"""
+        if FileStorage.__classes is None:
+            from models.base_model import BaseModel
+            from models.user import User
+            from models.place import Place
+            from models.state import State
+            from models.city import City
+            from models.amenity import Amenity
+            from models.review import Review
+
+            FileStorage.__classes = {
+                        'BaseModel': BaseModel, 'User': User, 'Place': Place,
+                        'State': State, 'City': City, 'Amenity': Amenity,
+                        'Review': Review
+                      }
+            for cls_name, fields in FileStorage.__ref_fields.items():
+                for field in fields:
+                    attr = getattr(FileStorage.__classes[cls_name], field)
+                    if isinstance(attr, InstrumentedAttribute):
+                        event.listen(attr, 'set', self.__ref_set)
+            for cls in FileStorage.__classes.values():
+                mapper = codec_of(cls).mapper
+                for prop in mapper.column_attrs if mapper else ():
+                    event.listen(getattr(cls, prop.key), 'set', self.__touch)
+        return FileStorage.__classes
+
+    def __decode(self, raw, cls_name):
+        """Returns the record dict of a pending record of cls_name"""
+        if FileStorage.__compact:
+            return raw
+        return codec_for(FileStorage.__file_path).loads(raw, cls_name)
+
+    def __raw(self, cls_name):
+        """Returns the pending records of cls_name as (key: raw) pairs"""
+        pending = FileStorage.__pending.get(cls_name, {})
+        if not FileStorage.__compact:
+            return pending
+        codec = codec_for(FileStorage.__file_path)
+        return {key: codec.dumps(val) for key, val in pending.items()}
+
+    def __digest(self, raw):
+        """Returns what __loaded keeps of a record, its hash"""
+        return hash(raw)
+
+    def __build(self, val):
+        """Creates the model object described by a record's dict"""
+        return codec_of(self.__models()[val['__class__']]).load(val)
+
+    def __add(self, key, obj):
+        """Stores obj under key in __objects and its class index"""
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        cls_name = key.partition('.')[0]
+        if key in FileStorage.__objects:
+            FileStorage.__indexed -= 1
+        elif cls_name in FileStorage.__pending:
+            FileStorage.__pending[cls_name].pop(key, None)
+        FileStorage.__objects[key] = obj
+        FileStorage.__by_class.setdefault(cls_name, {})[key] = obj
+        FileStorage.__indexed += 1
+        self.__link(key, obj)
+        self.__sort(key, obj)
+        self.__column(key, obj)
+        self.__locate(key, obj)
+
+    def __remove(self, key):
+        """Drops key from __objects and its class index"""
+        cls_name = key.partition('.')[0]
+        if key in FileStorage.__objects:
+            del FileStorage.__objects[key]
+            FileStorage.__by_class[cls_name].pop(key, None)
+            FileStorage.__indexed -= 1
+            self.__unlink(key)
+            self.__sort(key, None)
+            self.__column(key, None)
+            self.__locate(key, None)
+        elif cls_name in FileStorage.__pending:
+            FileStorage.__pending[cls_name].pop(key, None)
+
+    def __reindex(self):
+        """Rebuilds the class index after __objects was edited directly"""
+        for index in FileStorage.__by_class.values():
+            index.clear()
+        for key in list(FileStorage.__ref_values):
+            self.__unlink(key)
+        FileStorage.__sorted.clear()
+        FileStorage.__columns.clear()
+        FileStorage.__grid = None
+        for key, obj in FileStorage.__objects.items():
+            FileStorage.__by_class.setdefault(
+                key.partition('.')[0], {})[key] = obj
+            self.__link(key, obj)
+        FileStorage.__indexed = len(FileStorage.__objects)
+
+    def __link(self, key, obj, assigned=None):
+        """Files obj under its foreign key values in the reverse indexes
+
+        assigned holds values that are about to replace the ones in
+        obj.__dict__. A list value, like amenity_ids, is filed under each
+        of its items.
+        """
+        cls_name = key.partition('.')[0]
+        fields = FileStorage.__ref_fields.get(cls_name)
+        if not fields:
+            return
+        self.__unlink(key)
+        values = {}
+        for field in fields:
+            if assigned and field in assigned:
+                value = assigned[field]
+            else:
+                value = obj.__dict__.get(field)
+            value = tuple(value) if isinstance(value, list) else (value,)
+            values[field] = value
+            index = FileStorage.__refs.setdefault((cls_name, field), {})
+            for item in value:
+                index.setdefault(item, {})[key] = obj
+        FileStorage.__ref_values[key] = values
+
+    def __unlink(self, key):
+        """Removes key from the reverse indexes"""
+        values = FileStorage.__ref_values.pop(key, None)
+        if values is None:
+            return
+        cls_name = key.partition('.')[0]
+        for field, value in values.items():
+            index = FileStorage.__refs[(cls_name, field)]
+            for item in value:
+                index.get(item, {}).pop(key, None)
+
+    def __touch(self, target, value, oldvalue, initiator):
+        """Marks a stored object changed when one of its columns is set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if FileStorage.__objects.get(key) is target:
+            with FileStorage.__lock:
+                FileStorage.__changed.add(key)
+
+    def __ref_set(self, target, value, oldvalue, initiator):
+        """Refiles a stored object when one of its foreign keys is set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if FileStorage.__objects.get(key) is target:
+            self.__link(key, target, {initiator.key: value})
+
+    def __sorted_index(self, cls_name, field):
+        """Returns the sorted (field, id) index of cls_name, building it
+
+        The index is a sorted list of sort entries; __sorted also maps
+        each key to its entry so that it can be found again.
+        """
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        indexes = FileStorage.__sorted.setdefault(cls_name, {})
+        if field not in indexes:
+            entries = {
+                key: sort_entry(getattr(obj, field, None),
+                                key.partition('.')[2])
+                for key, obj in FileStorage.__by_class.get(
+                    cls_name, {}).items()}
+            indexes[field] = (sorted(entries.values()), entries)
+            attr = getattr(self.__models()[cls_name], field, None)
+            if (isinstance(attr, InstrumentedAttribute) and
+                    (cls_name, field) not in FileStorage.__sort_listeners):
+                event.listen(attr, 'set', self.__sort_set)
+                FileStorage.__sort_listeners.add((cls_name, field))
+        return indexes[field][0]
+
+    def __sort(self, key, obj, assigned=None):
+        """Moves key to the place of obj in the sorted indexes of its class
+
+        obj None removes key; assigned is as in __link(). An index that
+        gets a value it can't be sorted with, such as a number given as
+        a string, is dropped, to be built again when next used.
+        """
+        indexes = FileStorage.__sorted.get(key.partition('.')[0], {})
+        for field, (index, entries) in list(indexes.items()):
+            old = entries.pop(key, None)
+            if old is not None:
+                del index[bisect.bisect_left(index, old)]
+            if obj is None:
+                continue
+            if assigned and field in assigned:
+                value = assigned[field]
+            else:
+                value = getattr(obj, field, None)
+            entries[key] = sort_entry(value, key.partition('.')[2])
+            try:
+                bisect.insort(index, entries[key])
+            except TypeError:
+                del indexes[field]
+
+    def __sorted_query(self, cls, conds, order_by, limit, offset):
+        """Answers query() from the sorted indexes of cls, or returns None
+
+        With a limit and order_by one field with an index, that index is
+        walked from the end of the range its conditions allow until
+        enough objects meet the others; if few do, a column store tests
+        them instead when it can. Otherwise the narrowest range of an
+        indexed field gives the candidates, unless a column store would
+        answer faster. None is returned when no index helps, or when
+        values can't be sorted.
+        """
+        fields = FileStorage.__sortable_fields(cls)
+        bounds = {}
+        rest = []
+        for field, op, value in conds:
+            if field in fields and op in RANGE_OPERATORS and value is not None:
+                bounds.setdefault(field, []).append((op, value))
+            else:
+                rest.append((field, op, value))
+        if isinstance(order_by, str):
+            order_by = (order_by,)
+        order = None
+        if order_by and len(order_by) == 1 and limit:
+            order = order_by[0].lstrip('-')
+        if order not in fields and not bounds:
+            return None
+        cls_name = cls.__name__
+        objects = self.all(cls)
+        store = self.__column_store(cls_name)
+        if store is not None and not store.supports(conds):
+            store = None
+        try:
+            ranges = {field: sort_range(self.__sorted_index(cls_name, field),
+                                        items)
+                      for field, items in bounds.items()}
+            if order in fields:
+                index = self.__sorted_index(cls_name, order)
+        except TypeError:
+            return None
+        prefix = cls_name + '.'
+        if order not in fields:
+            field = min(ranges, key=lambda name: ranges[name][1] -
+                        ranges[name][0])
+            start, stop = ranges[field]
+            index = FileStorage.__sorted[cls_name][field][0]
+            if store is not None and (stop - start) * 32 > len(index):
+                return None
+            found = (objects[prefix + entry[2]] for entry in
+                     index[start:stop])
+            return select([obj for obj in found if matches(obj, conds)],
+                          None, order_by, limit, offset)
+        start, stop = ranges.get(order, (0, len(index)))
+        rest += [(field, op, value) for field, items in bounds.items()
+                 if field != order for op, value in items]
+        positions = range(start, stop)
+        if order_by[0].startswith('-'):
+            positions = reversed(positions)
+        found = []
+        skip = offset
+        keys = None
+        budget = 32 * (offset + limit) if rest and store is not None else -1
+        for step, position in enumerate(positions):
+            if step == budget:
+                # the other conditions are rare: let the store test them
+                keys = store.select(conds)
+                if len(keys) * 32 <= len(index):
+                    return select([objects[key] for key in keys], None,
+                                  order_by, limit, offset)
+                keys = set(keys)
+            key = prefix + index[position][2]
+            if keys is not None:
+                if key not in keys:
+                    continue
+            elif rest and not matches(objects[key], rest):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            found.append(objects[key])
+            if len(found) == limit:
+                break
+        return found
+
+    @staticmethod
+    def __sortable_fields(cls):
+        """Returns the fields of cls with a declared sorted index
+
+        Those are the fields of its (field, id) Index entries, which
+        DBStorage creates in the database.
+        """
+        fields = FileStorage.__sortable.get(cls.__name__)
+        if fields is None:
+            fields = FileStorage.__sortable[cls.__name__] = {
+                index.columns.keys()[0] for index in getattr(
+                    getattr(cls, '__table__', None), 'indexes', ())
+                if index.columns.keys()[1:] == ['id']}
+        return fields
+
+    def __sort_set(self, target, value, oldvalue, initiator):
+        """Moves a stored object when the field of a sorted index is set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if FileStorage.__objects.get(key) is target:
+            self.__sort(key, target, {initiator.key: value})
+
+    def __column_store(self, cls_name):
+        """Returns the ColumnStore of cls_name, building it, or None"""
+        fields = FileStorage.__column_fields.get(cls_name)
+        if fields is None:
+            return None
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        store = FileStorage.__columns.get(cls_name)
+        if store is None:
+            cls = self.__models()[cls_name]
+            store = FileStorage.__columns[cls_name] = ColumnStore(cls, fields)
+            for key, obj in FileStorage.__by_class.get(cls_name, {}).items():
+                store.set(key, obj)
+            listeners = FileStorage.__column_listeners
+            for field in fields:
+                attr = getattr(cls, field, None)
+                if (isinstance(attr, InstrumentedAttribute) and
+                        (cls_name, field) not in listeners):
+                    event.listen(attr, 'set', self.__column_set)
+                    listeners.add((cls_name, field))
+        return store
+
+    def __column(self, key, obj, assigned=None):
+        """Stores the fields of obj under key in its class's column store
+
+        obj None removes key; assigned is as in __link().
+        """
+        store = FileStorage.__columns.get(key.partition('.')[0])
+        if store is None:
+            return
+        if obj is None:
+            store.drop(key)
+        else:
+            store.set(key, obj, assigned)
+
+    def __column_set(self, target, value, oldvalue, initiator):
+        """Moves a stored object in its column store when a field is set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if FileStorage.__objects.get(key) is target:
+            self.__column(key, target, {initiator.key: value})
+
+    def __geo_grid(self):
+        """Returns the GeoGrid of the stored places, building it"""
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+        if FileStorage.__grid is None:
+            FileStorage.__grid = GeoGrid()
+            for key, obj in FileStorage.__by_class.get('Place', {}).items():
+                self.__locate(key, obj)
+            place = self.__models()['Place']
+            listeners = FileStorage.__grid_listeners
+            for field in ('latitude', 'longitude'):
+                attr = getattr(place, field, None)
+                if (isinstance(attr, InstrumentedAttribute) and
+                        field not in listeners):
+                    event.listen(attr, 'set', self.__locate_set)
+                    listeners.add(field)
+        return FileStorage.__grid
+
+    def __locate(self, key, obj, assigned=None):
+        """Files a stored place under its coordinates in the grid
+
+        obj None removes key; assigned is as in __link().
+        """
+        grid = FileStorage.__grid
+        if grid is None or not key.startswith('Place.'):
+            return
+        if obj is None:
+            grid.drop(key)
+            return
+        point = []
+        for field in ('latitude', 'longitude'):
+            if assigned and field in assigned:
+                point.append(assigned[field])
+            else:
+                point.append(obj.__dict__.get(field))
+        grid.set(key, *point)
+
+    def __locate_set(self, target, value, oldvalue, initiator):
+        """Moves a stored place in the grid when its coordinates are set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if FileStorage.__objects.get(key) is target:
+            self.__locate(key, target, {initiator.key: value})
+
+    def __hydrate(self, cls_name=None):
+        """Builds the objects of records that were loaded lazily"""
+        with FileStorage.__lock:
+            names = [cls_name] if cls_name else list(FileStorage.__pending)
+            for name in names:
+                pending = FileStorage.__pending.get(name)
+                while pending:
+                    key, raw = pending.popitem()
+                    self.__add(key, self.__build(self.__decode(raw, name)))
+
+    def __read(self, path, cls_name=None):
+        """Applies the records of path and drops loaded keys it lost
+
+        For a shard only keys of cls_name are considered, and objects
+        changed in memory are kept over the ones on disk. Returns False
+        when the file could not be decoded.
+        """
+        codec = codec_for(path)
+        seen = set()
+        try:
+            with open(path, 'rb' if codec.binary else 'r') as f:
+                self.__apply(codec.records(f, seen), cls_name is not None)
+        except ValueError:
+            return False
+        prefix = cls_name + '.' if cls_name else ''
+        for key in [k for k in FileStorage.__loaded
+                    if k.startswith(prefix) and k not in seen]:
+            if key not in FileStorage.__changed:
+                self.__remove(key)
+                del FileStorage.__loaded[key]
+        return True
+
+    def __load_shard(self, cls_name):
+        """Reads the file of cls_name if it changed since it was last read"""
+        with FileStorage.__lock:
+            path = self.__shard_path(cls_name)
+            stat = self.__stat(path)
+            if (cls_name in FileStorage.__shards and
+                    FileStorage.__shards[cls_name] == stat):
+                return
+            FileStorage.__shards[cls_name] = stat
+            if stat is not None:
+                self.__read(path, cls_name)
+
+    def __shard_path(self, cls_name):
+        """Returns the path of the file that holds the objects of cls_name"""
+        root, ext = os.path.splitext(FileStorage.__file_path)
+        return root + '.' + cls_name + ext
+
+    def __apply(self, records, local_wins=False):
+        """Brings in the records that differ from the last load
+
+        Records are (key, raw, dict) triples as read by the file's codec;
+        a raw of None means the key was deleted. With local_wins, keys
+        changed in memory since the last save are left alone.
+        """
+        loaded = FileStorage.__loaded
+        codec = codec_for(FileStorage.__file_path)
+        for key, raw, val in records:
+            if local_wins and key in FileStorage.__changed:
+                continue
+            if raw is None:
+                if key in loaded and key not in FileStorage.__changed:
+                    self.__remove(key)
+                loaded.pop(key, None)
+                continue
+            digest = self.__digest(raw)
+            if loaded.get(key) == digest and (
+                    key in FileStorage.__objects or
+                    key in FileStorage.__changed or
+                    key in FileStorage.__pending.get(key.partition('.')[0],
+                                                     ())):
+                continue
+            loaded[key] = digest
+            cls_name = key.partition('.')[0]
+            if FileStorage.__compact:
+                self.__remove(key)
+                pending = FileStorage.__pending.get(cls_name)
+                if pending is None:
+                    pending = FileStorage.__pending[cls_name] = CompactTable(
+                        self.__models()[cls_name])
+                pending[key] = val if val is not None else codec.loads(
+                    raw, cls_name)
+            elif FileStorage.__lazy:
+                self.__remove(key)
+                FileStorage.__pending.setdefault(cls_name, {})[key] = raw
+            else:
+                if val is None:
+                    val = codec.loads(raw, cls_name)
+                self.__add(key, self.__build(val))
+
+    def __replay(self):
+        """Applies journal records written since the last replay"""
+        stat = self.__stat(self.__journal_path())
+        if stat is None:
+            return
+        ino, pos = FileStorage.__journal_pos
+        if ino != stat[0] or pos > stat[1]:
+            pos = 0
+        if pos == stat[1]:
+            return
+        records = {}
+        codec = codec_for(FileStorage.__file_path)
+        with open(self.__journal_path(), 'rb') as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # torn write at the tail of the journal
+                try:
+                    record = json.loads(line)
+                    key, val = record['key'], record['value']
+                    raw = codec.dumps(val) if val else None
+                except (ValueError, KeyError, TypeError):
+                    break  # corrupt record, nothing after it is trusted
+                records[key] = (key, raw, val)
+                pos += len(line)
+        FileStorage.__journal_pos = (stat[0], pos)
+        self.__apply(records.values())
+
+    def __stat(self, path):
+        """Returns the (inode, size, mtime) of path, or None if missing"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def __flush(self):
+        """Writes pending changes as a journal append or a new snapshot
+
+        The changed keys are swapped for an empty set before anything is
+        written, so keys marked changed meanwhile wait for the next write;
+        they are put back if the write fails.
+        """
+        with FileStorage.__lock:
+            if FileStorage.__timer is not None:
+                FileStorage.__timer.cancel()
+                FileStorage.__timer = None
+                atexit.unregister(self.__flush)
+            changed, FileStorage.__changed = FileStorage.__changed, set()
+            try:
+                self.__write_changes(changed)
+            except BaseException:
+                FileStorage.__changed |= changed
+                raise
+
+    def __write_changes(self, changed):
+        """Writes the changed keys in the layout of the storage"""
+        if FileStorage.__sharded:
+            self.__write_shards(changed)
+            return
+        if FileStorage.__journal:
+            if changed:
+                self.__append(changed)
+            try:
+                size = os.path.getsize(self.__journal_path())
+            except FileNotFoundError:
+                size = 0
+            if size < FileStorage.__journal_limit:
+                return
+        elif (not changed and
+                len(FileStorage.__objects) == FileStorage.__indexed and
+                os.path.exists(FileStorage.__file_path)):
+            return
+        self.__snapshot()
+
+    def __snapshot(self):
+        """Rewrites the whole file and drops the journal it replaces
+
+        The data goes to a temporary file that is synced and renamed over
+        the old one, so a crash never leaves a half-written file.json.
+        Records that were never turned into objects are written back as
+        they were read.
+        """
+        codec = codec_for(FileStorage.__file_path)
+        loaded = {}
+        for key, val in FileStorage.__objects.items():
+            loaded[key] = codec.dumps(val.to_dict())
+        for cls_name in FileStorage.__pending:
+            loaded.update(self.__raw(cls_name))
+        self.__write(FileStorage.__file_path, loaded)
+        FileStorage.__loaded = {key: hash(raw) for key, raw in loaded.items()}
+        FileStorage.__snapshot_stat = self.__stat(FileStorage.__file_path)
+        FileStorage.__journal_pos = (None, 0)
+        try:
+            os.remove(self.__journal_path())
+        except FileNotFoundError:
+            pass
+
+    def __write_shards(self, changed):
+        """Rewrites the file of every class with changed objects"""
+        names = {key.partition('.')[0] for key in changed}
+        if len(FileStorage.__objects) != FileStorage.__indexed:
+            self.__reindex()
+            names.update(name for name, index in
+                         FileStorage.__by_class.items() if index)
+        codec = codec_for(FileStorage.__file_path)
+        for name in names:
+            if name not in FileStorage.__shards:
+                self.__load_shard(name)
+            records = {}
+            for key, val in FileStorage.__by_class.get(name, {}).items():
+                records[key] = codec.dumps(val.to_dict())
+            records.update(self.__raw(name))
+            path = self.__shard_path(name)
+            self.__write(path, records)
+            FileStorage.__shards[name] = self.__stat(path)
+            FileStorage.__loaded.update(
+                (key, self.__digest(raw)) for key, raw in records.items())
+        for key in changed:
+            if key not in FileStorage.__objects:
+                FileStorage.__loaded.pop(key, None)
+
+    def __write(self, path, records):
+        """Atomically replaces path with the (key: raw) records
+
+        The data goes to a temporary file that is synced and renamed over
+        the old one.
+        """
+        codec = codec_for(path)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb' if codec.binary else 'w') as f:
+            codec.write(f, records.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def __append(self, changed):
+        """Appends one journal record per object changed since last save
+
+        A record holds the key and the object's dict, or null for a key
+        that was deleted.
+        """
+        codec = codec_for(FileStorage.__file_path)
+        with open(self.__journal_path(), 'ab') as f:
+            start = f.tell()
+            for key in changed:
+                obj = FileStorage.__objects.get(key)
+                val = obj.to_dict() if obj is not None else None
+                f.write((json.dumps({'key': key, 'value': val}) +
+                         '\n').encode())
+                if val is None:
+                    FileStorage.__loaded.pop(key, None)
+                else:
+                    FileStorage.__loaded[key] = self.__digest(
+                        codec.dumps(val))
+            f.flush()
+            os.fsync(f.fileno())
+            ino = os.fstat(f.fileno()).st_ino
+            if FileStorage.__journal_pos == (ino, start) or start == 0:
+                FileStorage.__journal_pos = (ino, f.tell())
+
+    def __journal_path(self):
+        """Returns the path of the journal that belongs to __file_path"""
+        return FileStorage.__file_path + '.journal'
@@ -0,0 +1,482 @@
+#!/usr/bin/python3
+"""This module defines a storage engine that reads records through mmap
+
+Objects live in an append-only data file. A sorted index file maps each
+key (ClassName.id) to the (offset, length) of its latest record, so one
+object can be read without decoding any other. Records appended after
+the index was written form a tail that is scanned on reload and folded
+into a fresh data and index file by compact(). Appends and compact()
+hold an exclusive flock of the data file, so several processes can
+share it.
+
+Data file: DATA_MAGIC, a generation number, then records made of a
+(key length, value length) header, the key and a BinaryCodec payload;
+a value length of 0 marks a deleted key.
+Index file: INDEX_MAGIC, the generation and covered size of its data
+file, the entry count and key width, then fixed-width sorted entries.
+"""
+import fcntl
+import mmap
+import os
+import random
+import struct
+from contextlib import contextmanager
+from os import getenv
+from sqlalchemy import event
+from models.engine.column_store import aggregate_objects
+from models.engine.cursors import page_of
+from models.engine.file_codecs import BinaryCodec
+from models.engine.file_storage import assign, select
+from models.engine.model_codecs import codec_of
+from models.engine.spatial import check_point, nearest
+
+
+class MMapStorage:
+    """This class manages storage of hbnb models in a mapped record file
+
+    Keys passed to new() or delete(), and cached objects with a column
+    set, count as changed until the next save().
+    """
+    DATA_MAGIC = b'HBNBDAT1'
+    INDEX_MAGIC = b'HBNBIDX1'
+    data_header = struct.Struct('<8sQ')
+    index_header = struct.Struct('<8sQQQI')
+    record_header = struct.Struct('<HI')
+    entry = struct.Struct('<QI')
+
+    def __init__(self):
+        """Initialize a new MMapStorage instance"""
+        self.__path = getenv('HBNB_MMAP_PATH', 'file.dat')
+        self.__compact_limit = 4 * 1024 * 1024
+        self.__codec = BinaryCodec()
+        self.__objects = {}
+        self.__changed = set()
+        self.__classes = None
+        self.__reset()
+
+    def all(self, cls=None, load=None):
+        """Returns a dictionary of models currently in storage
+
+        load is accepted for compatibility with DBStorage and ignored.
+        """
+        prefix = cls.__name__ + '.' if cls else ''
+        dictionary = {}
+        for key in self.__keys(prefix):
+            obj = self.__load(key)
+            if obj is not None:
+                dictionary[key] = obj
+        return dictionary
+
+    def get(self, cls, id):
+        """Returns the object of cls with id, or None if there is none"""
+        return self.__load(cls.__name__ + '.' + str(id))
+
+    def count(self, cls=None):
+        """Returns the number of objects of cls, or of all objects"""
+        return len(self.__keys(cls.__name__ + '.' if cls else ''))
+
+    def query(self, cls, where=None, order_by=None, limit=None, offset=0,
+              load=None):
+        """Returns the objects of cls matching where, ordered and paged
+
+        See models.engine.file_storage.select() for the arguments; load
+        is ignored, as in all().
+        """
+        return select(self.all(cls).values(), where, order_by, limit,
+                      offset)
+
+    def aggregate(self, cls, op='count', field=None, where=None,
+                  group_by=None):
+        """Returns the op aggregate of field over the objects of cls
+
+        See FileStorage.aggregate() for the arguments. The objects are
+        scanned with iter(), so records are not kept in memory.
+        """
+        return aggregate_objects(self.iter(cls), op, field, where, group_by)
+
+    def nearby(self, lat, lon, radius_km=None, limit=None):
+        """Returns the places near a point, with their distances in km
+
+        See FileStorage.nearby(). The places are scanned with iter(), so
+        only the nearest ones are kept in memory.
+        """
+        check_point(lat, lon, radius_km, limit)
+        points = ((place, place.latitude, place.longitude)
+                  for place in self.iter(self.__classes['Place'])
+                  if place.latitude is not None and
+                  place.longitude is not None)
+        return [(place, distance) for distance, place in nearest(
+            points, lat, lon, radius_km, limit)]
+
+    def page(self, cls, limit=None, after=None, order_by=None, load=None):
+        """Returns up to limit objects of cls after a cursor, and the next
+
+        See FileStorage.page() for the arguments. There is no index on
+        the field here, so each page is found by a scan of iter().
+        """
+        return page_of(self.iter(cls), cls, limit, after, order_by)
+
+    def related(self, cls, field, value):
+        """Returns the objects of cls whose field holds value"""
+        related = {}
+        for key, obj in self.all(cls).items():
+            attr = getattr(obj, field, None)
+            if attr == value or (isinstance(attr, list) and value in attr):
+                related[key] = obj
+        return related
+
+    def iter(self, cls=None, batch_size=1000):
+        """Yields the objects of cls, or of every class, in key order
+
+        Records not read yet are decoded without being cached, so a full
+        scan holds one of them at a time; batch_size is accepted for
+        compatibility with DBStorage.
+        """
+        for key in sorted(self.__keys(cls.__name__ + '.' if cls else '')):
+            obj = self.__load(key, keep=False)
+            if obj is not None:
+                yield obj
+
+    def new(self, obj):
+        """Adds new object to storage"""
+        key = obj.__class__.__name__ + '.' + obj.id
+        self.__objects[key] = obj
+        self.__changed.add(key)
+
+    def new_many(self, objs):
+        """Adds every object of objs to storage, as new() does"""
+        for obj in objs:
+            self.new(obj)
+
+    def bulk_upsert(self, cls, rows):
+        """Creates or updates objects of cls from dicts of attributes
+
+        See FileStorage.bulk_upsert(); the records are appended by one
+        save(). Returns the number of rows.
+        """
+        count = 0
+        for row in rows:
+            obj = self.get(cls, row['id']) if 'id' in row else None
+            if obj is None:
+                obj = cls(**row)
+            else:
+                assign(obj, row)
+            self.new(obj)
+            count += 1
+        self.save()
+        return count
+
+    def save(self):
+        """Appends a record for every key changed since the last save
+
+        The records are appended under an exclusive flock of the data
+        file, at its end as found once the lock is held, so records other
+        processes appended meanwhile are kept; they are read first, and a
+        torn record left by a writer that died is cut off.
+        """
+        if not self.__changed:
+            return
+        self.reload()
+        if self.__data is None:
+            self.__create()
+        with self.__locked() as f:
+            self.__remap()
+            for key in self.__scan(self.__end):
+                if key not in self.__changed:
+                    self.__objects.pop(key, None)
+            if self.__end < f.tell():
+                f.truncate(self.__end)
+                f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            for key in self.__changed:
+                obj = self.__objects.get(key)
+                raw = (self.__codec.dumps(obj.to_dict())
+                       if obj is not None else b'')
+                data = key.encode()
+                f.write(self.record_header.pack(len(data), len(raw)) +
+                        data + raw)
+                pos += self.record_header.size + len(data)
+                self.__tail[key] = (pos, len(raw)) if raw else None
+                pos += len(raw)
+            f.flush()
+            os.fsync(f.fileno())
+            self.__end = pos
+        self.__changed.clear()
+        self.__remap()
+        if self.__end - self.__covered > self.__compact_limit:
+            self.compact()
+
+    def delete(self, obj=None):
+        """Deletes obj from storage"""
+        if obj is None:
+            return
+        key = obj.__class__.__name__ + '.' + obj.id
+        if self.__load(key) is not None:
+            self.__objects[key] = None
+            self.__changed.add(key)
+
+    def reload(self):
+        """Maps the data and index files, reading only their new records"""
+        from models.base_model import BaseModel
+        from models.user import User
+        from models.place import Place
+        from models.state import State
+        from models.city import City
+        from models.amenity import Amenity
+        from models.review import Review
+
+        if self.__classes is None:
+            self.__classes = {
+                        'BaseModel': BaseModel, 'User': User, 'Place': Place,
+                        'State': State, 'City': City, 'Amenity': Amenity,
+                        'Review': Review
+                      }
+            for cls in self.__classes.values():
+                mapper = codec_of(cls).mapper
+                for prop in mapper.column_attrs if mapper else ():
+                    event.listen(getattr(cls, prop.key), 'set', self.__touch)
+        try:
+            st = os.stat(self.__path)
+        except FileNotFoundError:
+            return
+        if self.__data is not None and st.st_ino == self.__ino:
+            if st.st_size != self.__end:
+                self.__remap()
+                for key in self.__scan(self.__end):
+                    if key not in self.__changed:
+                        self.__objects.pop(key, None)
+            return
+        self.__reset()
+        self.__remap()
+        if self.__data is None:
+            return
+        self.__ino = st.st_ino
+        magic, self.__generation = self.data_header.unpack_from(self.__data)
+        if magic != self.DATA_MAGIC:
+            raise ValueError('Not an hbnb data file: ' + self.__path)
+        self.__open_index()
+        self.__end = self.__covered
+        self.__scan(self.__covered)
+
+    def close(self):
+        """Picks up records other processes appended since the last call"""
+        self.reload()
+
+    def compact(self):
+        """Rewrites the data file with live records only, plus its index
+
+        The data file stays locked until it is replaced, so no record
+        appended meanwhile is lost.
+        """
+        self.save()
+        with self.__locked():
+            self.reload()
+            self.__rewrite()
+        objects = self.__objects
+        self.reload()
+        self.__objects = objects
+
+    def __rewrite(self):
+        """Writes the live records to a new data file and its index"""
+        keys = sorted(self.__keys(''))
+        generation = random.getrandbits(63)
+        entries = []
+        with open(self.__path + '.tmp', 'wb') as f:
+            f.write(self.data_header.pack(self.DATA_MAGIC, generation))
+            pos = self.data_header.size
+            for key in keys:
+                offset, length = self.__find(key)
+                data = key.encode()
+                f.write(self.record_header.pack(len(data), length) + data +
+                        self.__data[offset:offset + length])
+                pos += self.record_header.size + len(data)
+                entries.append((data, pos, length))
+                pos += length
+            f.flush()
+            os.fsync(f.fileno())
+        width = max([len(data) for data, _, _ in entries] or [0])
+        with open(self.__path + '.idx.tmp', 'wb') as f:
+            f.write(self.index_header.pack(self.INDEX_MAGIC, generation, pos,
+                                           len(entries), width))
+            for data, offset, length in entries:
+                f.write(data.ljust(width, b'\0') +
+                        self.entry.pack(offset, length))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.__path + '.tmp', self.__path)
+        os.replace(self.__path + '.idx.tmp', self.__path + '.idx')
+
+    @contextmanager
+    def __locked(self):
+        """Holds an exclusive flock of the data file
+
+        Yields the file opened for appending and positioned at its end.
+        A file replaced by compact() while waiting for the lock is
+        reloaded and locked again.
+        """
+        while True:
+            f = open(self.__path, 'ab')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                if os.fstat(f.fileno()).st_ino == os.stat(self.__path).st_ino:
+                    f.seek(0, os.SEEK_END)
+                    yield f
+                    return
+            finally:
+                f.close()
+            self.reload()
+
+    def __touch(self, target, value, oldvalue, initiator):
+        """Marks a cached object changed when one of its columns is set"""
+        key = target.__class__.__name__ + '.' + str(target.__dict__.get('id'))
+        if self.__objects.get(key) is target:
+            self.__changed.add(key)
+
+    def __reset(self):
+        """Forgets every mapping and offset read so far"""
+        self.__data = None
+        self.__index = None
+        self.__ino = None
+        self.__generation = None
+        self.__count = 0
+        self.__width = 0
+        self.__covered = self.data_header.size
+        self.__end = self.data_header.size
+        self.__tail = {}
+        self.__objects = {k: self.__objects[k] for k in self.__changed}
+
+    def __create(self):
+        """Starts an empty data file"""
+        self.__reset()
+        with open(self.__path, 'wb') as f:
+            self.__generation = random.getrandbits(63)
+            f.write(self.data_header.pack(self.DATA_MAGIC, self.__generation))
+        self.__ino = os.stat(self.__path).st_ino
+        self.__remap()
+
+    def __remap(self):
+        """Maps the whole data file, which may have grown
+
+        A file too short to hold its header is treated as missing.
+        """
+        with open(self.__path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.data_header.size:
+                self.__data = None
+                return
+            self.__data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __open_index(self):
+        """Maps the index file if it belongs to the current data file"""
+        try:
+            with open(self.__path + '.idx', 'rb') as f:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+        magic, generation, covered, count, width = \
+            self.index_header.unpack_from(index)
+        if (magic != self.INDEX_MAGIC or generation != self.__generation or
+                covered > len(self.__data)):
+            return
+        self.__index = index
+        self.__covered = covered
+        self.__count = count
+        self.__width = width
+
+    def __scan(self, pos):
+        """Reads the records from pos to the end of the data file
+
+        Returns the keys they touch; a torn record at the end is ignored.
+        """
+        keys = []
+        size = len(self.__data)
+        header = self.record_header
+        while pos + header.size <= size:
+            key_len, length = header.unpack_from(self.__data, pos)
+            start = pos + header.size + key_len
+            if start + length > size:
+                break
+            key = self.__data[pos + header.size:start].decode()
+            self.__tail[key] = (start, length) if length else None
+            keys.append(key)
+            pos = start + length
+        self.__end = pos
+        return keys
+
+    def __entry_key(self, i):
+        """Returns the key of index entry i"""
+        pos = self.index_header.size + i * (self.__width + self.entry.size)
+        return self.__index[pos:pos + self.__width].rstrip(b'\0')
+
+    def __entry(self, i):
+        """Returns the (offset, length) of index entry i"""
+        pos = (self.index_header.size + i * (self.__width + self.entry.size) +
+               self.__width)
+        return self.entry.unpack_from(self.__index, pos)
+
+    def __lower(self, data):
+        """Returns the first index entry whose key is not below data"""
+        lo, hi = 0, self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.__entry_key(mid) < data:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __find(self, key):
+        """Returns the (offset, length) of key's record, or None"""
+        if key in self.__tail:
+            return self.__tail[key]
+        if self.__index is None:
+            return None
+        data = key.encode()
+        i = self.__lower(data)
+        if i < self.__count and self.__entry_key(i) == data:
+            return self.__entry(i)
+        return None
+
+    def __keys(self, prefix):
+        """Returns the stored keys that start with prefix"""
+        keys = set()
+        if self.__index is not None:
+            data = prefix.encode()
+            i = self.__lower(data)
+            while i < self.__count:
+                key = self.__entry_key(i)
+                if not key.startswith(data):
+                    break
+                keys.add(key.decode())
+                i += 1
+        for key, found in self.__tail.items():
+            if key.startswith(prefix):
+                if found is None:
+                    keys.discard(key)
+                else:
+                    keys.add(key)
+        for key in self.__changed:
+            if key.startswith(prefix):
+                if self.__objects.get(key) is None:
+                    keys.discard(key)
+                else:
+                    keys.add(key)
+        return keys
+
+    def __load(self, key, keep=True):
+        """Returns the object stored under key, reading it if needed
+
+        An object read from the data file is cached unless keep is False.
+        """
+        if key in self.__objects:
+            return self.__objects[key]
+        found = self.__find(key)
+        if found is None or self.__data is None:
+            return None
+        offset, length = found
+        cls_name = key.partition('.')[0]
+        val = self.__codec.loads(self.__data[offset:offset + length],
+                                 cls_name)
+        obj = codec_of(self.__classes[cls_name]).load(val)
+        if keep:
+            self.__objects[key] = obj
+        return obj
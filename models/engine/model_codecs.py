@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""This module defines the per-class codecs that turn models into dicts
+
+A ModelCodec is built once per model class from its SQLAlchemy columns:
+it caches the class name, the DateTime fields to convert to and from
+ISO strings and the fields that can be written straight into __dict__.
+to_dict(), __init__(**kwargs) and the storage engines go through it
+instead of working those out again for every object.
+"""
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, inspect
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+codecs = {}
+
+
+class ModelCodec:
+    """Converts the objects of one model class to and from dicts"""
+
+    def __init__(self, cls):
+        """Works out the fields of cls from its columns"""
+        self.cls = cls
+        self.cls_name = cls.__name__
+        self.mapper = inspect(cls, raiseerr=False)
+        if self.mapper is not None:
+            columns = {prop.key: prop.columns[0]
+                       for prop in self.mapper.column_attrs}
+        else:
+            columns = {}
+            for klass in reversed(cls.__mro__):
+                columns.update((name, attr) for name, attr in
+                               vars(klass).items() if isinstance(attr, Column))
+        self.columns = columns
+        self.datetimes = tuple(name for name, column in columns.items()
+                               if isinstance(column.type, DateTime))
+        # columns are stored in __dict__ as they are, without events
+        self.direct = {name: True for name in columns}
+
+    def is_direct(self, name):
+        """Tells if name can be set by writing to __dict__
+
+        That holds for columns and for names the class does not define,
+        but not for properties and relationships, which are set with
+        setattr() so that their setters and events run.
+        """
+        direct = self.direct.get(name)
+        if direct is None:
+            attr = getattr(self.cls, name, None)
+            direct = not (hasattr(attr, '__set__') or
+                          isinstance(attr, InstrumentedAttribute))
+            self.direct[name] = direct
+        return direct
+
+    def hydrate(self, obj, values):
+        """Sets the attributes of a new obj from values, as __init__ does
+
+        A missing id is generated and missing dates are set to now; ISO
+        strings are parsed for DateTime fields.
+        """
+        state = obj.__dict__
+        if 'id' not in values:
+            state['id'] = str(uuid.uuid4())
+        for name in ('created_at', 'updated_at'):
+            if name not in values:
+                state[name] = datetime.now()
+        for name, value in values.items():
+            if name == '__class__':
+                continue
+            if name in self.datetimes and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            if self.direct.get(name) or self.is_direct(name):
+                state[name] = value
+            else:
+                setattr(obj, name, value)
+
+    def load(self, values):
+        """Returns an object of the class built from a record dict
+
+        __init__ is skipped; the record is expected to hold the id and
+        dates, as the ones to_dict() returns do.
+        """
+        if self.mapper is not None:
+            obj = self.mapper.class_manager.new_instance()
+        else:
+            obj = self.cls.__new__(self.cls)
+        self.hydrate(obj, values)
+        return obj
+
+    def to_dict(self, obj):
+        """Returns the record dict of obj, dates as ISO strings"""
+        dictionary = obj.__dict__.copy()
+        dictionary['__class__'] = self.cls_name
+        for name in self.datetimes:
+            value = dictionary.get(name)
+            if isinstance(value, datetime):
+                dictionary[name] = value.isoformat()
+        dictionary.pop('_sa_instance_state', None)
+        return dictionary
+
+
+def codec_of(cls):
+    """Returns the ModelCodec of cls, building it the first time"""
+    codec = codecs.get(cls)
+    if codec is None:
+        codec = codecs[cls] = ModelCodec(cls)
+    return codec
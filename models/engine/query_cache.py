@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+"""This module defines the result cache DBStorage keeps for its reads
+
+Each entry holds the objects a read returned, the names of the classes
+whose tables it read, an estimate of its size and the time it expires.
+Entries are evicted least recently used first, once there are more than
+max_entries of them or they add up to more than max_bytes, and are
+dropped when one of their classes is invalidated. A result read while
+an invalidation happened is not kept, since it may predate the change.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """An LRU cache of query results with a TTL and a memory cap"""
+
+    def __init__(self, max_entries, ttl, max_bytes):
+        """Initialize an empty cache"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.version = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0,
+                         'invalidations': 0}
+
+    def get(self, key):
+        """Returns the cached objects of key, or None"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[3] < time.monotonic():
+                self.__drop(key)
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[0]
+
+    def put(self, key, objects, classes, version):
+        """Caches objects, read from the tables of classes, under key
+
+        version is the value of self.version before they were read.
+        Results larger than the whole cache are not kept.
+        """
+        size = self.size(objects)
+        if size > self.max_bytes:
+            return
+        with self.__lock:
+            if version != self.version:
+                return
+            if key in self.__entries:
+                self.__drop(key)
+            self.__entries[key] = (objects, frozenset(classes), size,
+                                   time.monotonic() + self.ttl)
+            self.__bytes += size
+            while (len(self.__entries) > self.max_entries or
+                   self.__bytes > self.max_bytes):
+                self.__drop(next(iter(self.__entries)))
+                self.counters['evictions'] += 1
+
+    def invalidate(self, classes):
+        """Drops the entries that read from any of classes"""
+        classes = set(classes)
+        if not classes:
+            return
+        with self.__lock:
+            self.version += 1
+            for key in [key for key, entry in self.__entries.items()
+                        if entry[1] & classes]:
+                self.__drop(key)
+                self.counters['invalidations'] += 1
+
+    def stats(self):
+        """Returns the counters with the current entry count and size"""
+        with self.__lock:
+            return dict(self.counters, entries=len(self.__entries),
+                        bytes=self.__bytes)
+
+    @staticmethod
+    def size(objects):
+        """Returns a rough size in bytes of objects and their attributes"""
+        size = sys.getsizeof(objects)
+        for obj in objects:
+            size += sys.getsizeof(obj) + sys.getsizeof(obj.__dict__)
+            size += sum(sys.getsizeof(value)
+                        for value in obj.__dict__.values())
+        return size
+
+    def __drop(self, key):
+        """Removes the entry of key"""
+        self.__bytes -= self.__entries.pop(key)[2]
@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+"""This module defines the spatial search behind storage.nearby()
+
+A search looks at the points in the bounding box of a circle around the
+query point and keeps the ones whose great-circle distance is within
+its radius, found from the chord between their unit vectors. With a
+limit, circles of growing radius are searched until one holds enough
+points, so a dense area costs no more than the points it needs and the
+nearest points can be found without any radius.
+
+FileStorage finds the points of a box in a GeoGrid, a geohash-like grid
+of the points at a few cell sizes; DBStorage with a range query on an
+index of the latitude and longitude columns.
+"""
+import heapq
+import math
+from operator import itemgetter
+
+EARTH_RADIUS_KM = 6371.0088
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+START_RADIUS_KM = 1.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance in km between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) *
+         math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """Returns the (south, north, longitude ranges) box around a circle
+
+    The longitude ranges are (west, east) pairs within [-180, 180]: two
+    when the box crosses the antimeridian and the whole range when the
+    circle holds a pole.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    south = lat - math.degrees(angle)
+    north = lat + math.degrees(angle)
+    if south <= -90 or north >= 90:
+        return max(south, -90.0), min(north, 90.0), [(-180.0, 180.0)]
+    dlon = math.degrees(math.asin(min(1.0, math.sin(angle) /
+                                      math.cos(math.radians(lat)))))
+    west, east = lon - dlon, lon + dlon
+    if west < -180:
+        return south, north, [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return south, north, [(west, 180.0), (-180.0, east - 360)]
+    return south, north, [(west, east)]
+
+
+def check_point(lat, lon, radius_km=None, limit=None):
+    """Raises ValueError for a query point or bounds nearby() can't take"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('Invalid coordinates: {}, {}'.format(lat, lon))
+    if radius_km is None and limit is None:
+        raise ValueError('nearby() needs a radius or a limit')
+    if radius_km is not None and radius_km < 0 or (
+            limit is not None and limit < 1):
+        raise ValueError('Invalid radius or limit')
+
+
+def vector(lat, lon):
+    """Returns the unit vector of a point, from the center of the earth"""
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon),
+            math.sin(lat))
+
+
+def chord(radius_km):
+    """Returns the squared length of the chord of a great-circle distance,
+    between unit vectors
+    """
+    angle = min(radius_km, HALF_CIRCUMFERENCE_KM) / EARTH_RADIUS_KM
+    return (2 * math.sin(angle / 2)) ** 2
+
+
+def closest(found, limit=None):
+    """Returns (distance, item) pairs for (squared chord, item) pairs,
+    nearest first and at most limit of them
+
+    The squared chords are at most 4, that of two antipodes.
+    """
+    if limit is None:
+        found = sorted(found, key=itemgetter(0))
+    else:
+        found = heapq.nsmallest(limit, found, key=itemgetter(0))
+    asin, sqrt = math.asin, math.sqrt
+    return [(2 * EARTH_RADIUS_KM * asin(sqrt(length) / 2), item)
+            for length, item in found]
+
+
+def nearest(points, lat, lon, radius_km=None, limit=None):
+    """Returns the (distance, item) pairs of the points near lat, lon
+
+    points are (item, latitude, longitude) triples. Only those within
+    radius_km are kept, nearest first and at most limit of them.
+    """
+    x, y, z = vector(lat, lon)
+    bound = 4.0 if radius_km is None else chord(radius_km)
+    found = []
+    for item, point_lat, point_lon in points:
+        point_x, point_y, point_z = vector(point_lat, point_lon)
+        length = ((point_x - x) ** 2 + (point_y - y) ** 2 +
+                  (point_z - z) ** 2)
+        if length <= bound:
+            found.append((length, item))
+    return closest(found, limit)
+
+
+def search(find, lat, lon, radius_km=None, limit=None):
+    """Returns the (distance, item) pairs of the points nearest lat, lon
+
+    find(box, radius_km, limit) returns the pairs of the points of a
+    bounding_box() as nearest() does. The points within radius_km come
+    nearest first, at most limit of them; without a radius, the limit
+    nearest points are returned.
+    """
+    check_point(lat, lon, radius_km, limit)
+    end = HALF_CIRCUMFERENCE_KM if radius_km is None else radius_km
+    radius = end if limit is None else min(end, START_RADIUS_KM)
+    while True:
+        found = find(bounding_box(lat, lon, radius),
+                     None if radius >= HALF_CIRCUMFERENCE_KM else radius,
+                     limit)
+        if radius >= end or len(found) == limit:
+            return found
+        radius = min(end, radius * 4)
+
+
+class GeoGrid:
+    """The points of some keys, filed in grid cells of several sizes
+
+    A box is searched at the finest size that covers it with at most
+    MAX_CELLS cells, so small boxes read few points and large ones few
+    cells. The unit vector of each point is kept with it, so testing a
+    point takes no trigonometry. Keys without valid coordinates are
+    left out.
+    """
+    SIZES = (0.01, 0.1, 1.0)
+    MAX_CELLS = 256
+
+    def __init__(self):
+        """Initialize an empty grid"""
+        self.points = {}
+        self.cells = [{} for _ in self.SIZES]
+
+    def __len__(self):
+        """Returns the number of points in the grid"""
+        return len(self.points)
+
+    def set(self, key, lat, lon):
+        """Files key at lat, lon, or leaves it out if they are not valid"""
+        self.drop(key)
+        if not (type(lat) in (int, float) and type(lon) in (int, float) and
+                -90 <= lat <= 90 and -180 <= lon <= 180):
+            return
+        point = self.points[key] = (lat, lon) + vector(lat, lon)
+        for size, cells in zip(self.SIZES, self.cells):
+            cells.setdefault((math.floor(lat / size),
+                              math.floor(lon / size)), {})[key] = point
+
+    def drop(self, key):
+        """Removes key from the grid, if it is there"""
+        point = self.points.pop(key, None)
+        if point is None:
+            return
+        for size, cells in zip(self.SIZES, self.cells):
+            cell = (math.floor(point[0] / size), math.floor(point[1] / size))
+            points = cells[cell]
+            del points[key]
+            if not points:
+                del cells[cell]
+
+    def search(self, lat, lon, radius_km=None, limit=None):
+        """Returns the (distance, key) pairs of the keys nearest lat, lon
+
+        See search() for the arguments.
+        """
+        def find(box, radius_km, limit):
+            return self.nearest(box, lat, lon, radius_km, limit)
+        return search(find, lat, lon, radius_km, limit)
+
+    def nearest(self, box, lat, lon, radius_km=None, limit=None):
+        """Returns the (distance, key) pairs of the keys of box near lat,
+        lon, as nearest() does
+        """
+        x, y, z = vector(lat, lon)
+        bound = 4.0 if radius_km is None else chord(radius_km)
+        found = []
+        for points in self.__cells(box):
+            for key, (_, _, point_x, point_y, point_z) in points.items():
+                length = ((point_x - x) * (point_x - x) +
+                          (point_y - y) * (point_y - y) +
+                          (point_z - z) * (point_z - z))
+                if length <= bound:
+                    found.append((length, key))
+        return closest(found, limit)
+
+    def __cells(self, box):
+        """Returns the points, by key, of the cells that cover box"""
+        south, north, ranges = box
+        for size, cells in zip(self.SIZES, self.cells):
+            rows = range(math.floor(south / size),
+                         math.floor(north / size) + 1)
+            columns = [range(math.floor(west / size),
+                             math.floor(east / size) + 1)
+                       for west, east in ranges]
+            count = len(rows) * sum(map(len, columns))
+            if count <= self.MAX_CELLS:
+                break
+        if count > len(cells):
+            # the box spans more cells than there are points in
+            return [points for (row, column), points in cells.items()
+                    if row in rows and any(column in c for c in columns)]
+        return [cells[(row, column)] for row in rows
+                for span in columns for column in span
+                if (row, column) in cells]
@@ -2,6 +2,7 @@
 """ Place Module for HBNB project """
 from models.base_model import BaseModel, Base
 from sqlalchemy import Column, String, Integer, Float, ForeignKey, Table
+from sqlalchemy import Index
 from sqlalchemy.orm import relationship
 from os import getenv
 from models.review import Review
@@ -17,6 +18,16 @@ place_amenity = Table('place_amenity', Base.metadata,
 class Place(BaseModel, Base):
     """ A place to stay """
     __tablename__ = 'places'
+    __table_args__ = (Index('ix_places_name_id', 'name', 'id'),
+                      Index('ix_places_latitude_longitude', 'latitude',
+                            'longitude', 'id'),
+                      Index('ix_places_price_by_night_id', 'price_by_night',
+                            'id'),
+                      Index('ix_places_max_guest_id', 'max_guest', 'id'),
+                      Index('ix_places_number_rooms_id', 'number_rooms',
+                            'id'),
+                      Index('ix_places_number_bathrooms_id',
+                            'number_bathrooms', 'id'))
     city_id = Column(String(60), ForeignKey('cities.id'), nullable=False)
     user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
     name = Column(String(128), nullable=False)
@@ -32,18 +43,14 @@ class Place(BaseModel, Base):
                              viewonly=False, overlaps="place_amenities")
     amenity_ids = []
 
-    if getenv("HBNB_TYPE_STORAGE") != "db":
+    if getenv("HBNB_TYPE_STORAGE") not in ("db", "sqlite"):
         @property
         def reviews(self):
             """Return the list of Review instances with place_id equals to the
             current Place.id
             """
-            review_list = []
-            all_reviews = models.storage.all(Review).values()
-            for review in all_reviews:
-                if review.place_id == self.id:
-                    review_list.append(review)
-            return review_list
+            return list(
+                models.storage.related(Review, 'place_id', self.id).values())
 
         @property
         def amenities(self):
@@ -51,8 +58,10 @@ class Place(BaseModel, Base):
             current Place.id
             """
             from models.amenity import Amenity
-            return [amenity for amenity in models.storage.all(Amenity).values()
-                    if amenity.id in self.amenity_ids]
+            amenities = models.storage.all(Amenity)
+            keys = ['Amenity.' + amenity_id
+                    for amenity_id in dict.fromkeys(self.amenity_ids)]
+            return [amenities[key] for key in keys if key in amenities]
 
         @amenities.setter
         def amenities(self, value):
@@ -60,5 +69,8 @@ class Place(BaseModel, Base):
             current Place.id
             """
             from models.amenity import Amenity
-            if isinstance(value, Amenity):
-                self.amenity_ids.append(value.id)
+            if isinstance(value, Amenity) and value.id not in self.amenity_ids:
+                self.amenity_ids = self.amenity_ids + [value.id]
+                if models.storage.get(Place, self.id) is self:
+                    # amenity_ids is not instrumented, so relink by hand
+                    models.storage.new(self)
@@ -1,12 +1,13 @@
 #!/usr/bin/python3
 """ Review module for the HBNB project """
 from models.base_model import BaseModel, Base
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, Index, String, ForeignKey
 
 
 class Review(BaseModel, Base):
     """ Review class to store review information """
     __tablename__ = 'reviews'
+    __table_args__ = (Index('ix_reviews_created_at_id', 'created_at', 'id'),)
     text = Column(String(1024), nullable=False)
     place_id = Column(String(60), ForeignKey('places.id'), nullable=False)
     user_id = Column(String(60), ForeignKey('users.id'), nullable=False)
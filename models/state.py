@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 """ State Module for HBNB project """
 from models.base_model import BaseModel, Base
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlalchemy.orm import relationship
 from os import getenv
 from models.city import City
@@ -11,16 +11,14 @@ import models
 class State(BaseModel, Base):
     """ State class """
     __tablename__ = 'states'
+    __table_args__ = (Index('ix_states_name_id', 'name', 'id'),)
     name = Column(String(128), nullable=False)
     cities = relationship("City", backref="state", cascade="all, delete")
 
-    if getenv('HBNB_TYPE_STORAGE') != 'db':
+    if getenv('HBNB_TYPE_STORAGE') not in ('db', 'sqlite'):
         @property
         def cities(self):
             """Returns the list of City instances with state_id
             equals to the current State.id"""
-            city_list = []
-            for city in models.storage.all(City).values():
-                if city.state_id == self.id:
-                    city_list.append(city)
-            return city_list
+            return list(
+                models.storage.related(City, 'state_id', self.id).values())
@@ -124,6 +124,42 @@ class TestConsole(unittest.TestCase):
         self.assertIn('updated_at', output)
         self.assertIn('datetime.datetime', output)
 
+    def test_all_pages(self):
+        """ Test that all --limit prints a page and the next cursor """
+        storage.all().clear()
+        for name in ("Page_b", "Page_a"):
+            storage.new(State(name=name))
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('all State --limit 1')
+        lines = f.getvalue().splitlines()
+        self.assertIn("'name': 'Page_a'", lines[0])
+        self.assertTrue(lines[1].startswith('--after '))
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('all State --limit 5 ' + lines[1])
+        self.assertNotIn("'name': 'Page_a'", f.getvalue())
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('all State --limit 0')
+            self.console.onecmd('all State --after nope')
+        self.assertEqual(f.getvalue(),
+                         "** invalid limit **\n** invalid cursor **\n")
+
+    def test_show_and_count(self):
+        """ Test show and count use storage get and count """
+        state = State(name="Shown")
+        storage.new(state)
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('show State {}'.format(state.id))
+        self.assertIn("'name': 'Shown'", f.getvalue())
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('show State missing-id')
+        self.assertEqual(f.getvalue().strip(), "** no instance found **")
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('count State')
+        self.assertEqual(int(f.getvalue()), storage.count(State))
+        with redirect_stdout(io.StringIO()) as f:
+            self.console.onecmd('destroy State {}'.format(state.id))
+        self.assertIsNone(storage.get(State, state.id))
+
     def test_create_missing_class(self):
         """ Test create command with missing class name """
         with redirect_stdout(io.StringIO()) as f:
@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+""" Module for testing the column store"""
+import unittest
+from models.engine.column_store import ColumnStore, aggregate_objects
+from models.engine.column_store import conditions
+from models.place import Place
+
+FIELDS = ('city_id', 'user_id', 'price_by_night', 'number_rooms',
+          'latitude')
+
+
+class test_columnStore(unittest.TestCase):
+    """ Class to test the column store of Place fields """
+
+    def setUp(self):
+        """ Set up a store of five places """
+        self.store = ColumnStore(Place, FIELDS)
+        self.places = [
+            Place(city_id="c1", user_id="u1", price_by_night=50,
+                  number_rooms=3, latitude=1.5),
+            Place(city_id="c1", user_id="u2", price_by_night=150,
+                  number_rooms=4, latitude=-1.0),
+            Place(city_id="c2", user_id="u1", price_by_night=80,
+                  number_rooms=1),
+            Place(city_id="c1", user_id="u1", price_by_night=99,
+                  number_rooms=5, latitude=2.0),
+            Place(city_id=None, user_id="u3", price_by_night=10),
+        ]
+        for place in self.places:
+            self.store.set('Place.' + place.id, place)
+
+    def select(self, where):
+        """ Tells if the store selects the places a scan finds """
+        keys = self.store.select(conditions(where))
+        return sorted(keys) == sorted('Place.' + place.id for place in
+                                      self.places if self.match(place, where))
+
+    def match(self, place, where):
+        """ Scans for the places matching where """
+        return aggregate_objects([place], 'count', where=where) == 1
+
+    def test_conditions(self):
+        """ Keys are split into a field and an operator """
+        self.assertEqual(conditions({'a': 1, 'b <=': 2}),
+                         [('a', '==', 1), ('b', '<=', 2)])
+        with self.assertRaises(ValueError):
+            conditions({'a ~': 1})
+
+    def test_select(self):
+        """ The store selects the rows a scan of the objects finds """
+        for where in ({'city_id': "c1", 'price_by_night <': 100,
+                       'number_rooms >=': 3},
+                      {'city_id': "c9"}, {'city_id': None},
+                      {'city_id !=': "c1"}, {'latitude !=': 1.5},
+                      {'latitude': None}, {'latitude >': 0},
+                      {'user_id in': ("u2", "u3")},
+                      {'number_rooms in': [1, 5]}, {'user_id >': "u1"}, {}):
+            self.assertTrue(self.select(where), where)
+        self.assertEqual(len(self.store.select(conditions(
+            {'city_id': "c1", 'price_by_night <': 100,
+             'number_rooms >=': 3}))), 2)
+
+    def test_narrow(self):
+        """ Few rows left by an equality are tested one by one """
+        for number in range(100):
+            place = Place(city_id="c{}".format(number % 50),
+                          price_by_night=number, latitude=None)
+            self.places.append(place)
+            self.store.set('Place.' + place.id, place)
+        for where in ({'city_id': "c1", 'price_by_night >': 40},
+                      {'city_id': "c1", 'latitude !=': None},
+                      {'city_id in': ["c1", "c2"], 'price_by_night !=': 51,
+                       'number_rooms': None}):
+            self.assertTrue(self.select(where), where)
+
+    def test_aggregate(self):
+        """ Aggregates match a scan, integer fields staying integers """
+        cases = [('count', None, None, None),
+                 ('count', 'latitude', None, None),
+                 ('sum', 'price_by_night', {'city_id': "c1"}, None),
+                 ('max', 'number_rooms', None, None),
+                 ('min', 'latitude', None, None),
+                 ('avg', 'price_by_night', None, None),
+                 ('count', None, None, 'user_id'),
+                 ('count', None, None, 'city_id'),
+                 ('sum', 'price_by_night', None, 'user_id'),
+                 ('avg', 'latitude', None, 'city_id'),
+                 ('count', None, {'latitude': None}, 'number_rooms')]
+        for op, field, where, group_by in cases:
+            expected = aggregate_objects(self.places, op, field, where,
+                                         group_by)
+            result = self.store.aggregate(op, field, conditions(where),
+                                          group_by)
+            self.assertEqual(result, expected, (op, field, group_by))
+        self.assertIs(type(self.store.aggregate(
+            'sum', 'price_by_night')), int)
+        self.assertIsNone(self.store.aggregate(
+            'max', 'latitude', conditions({'city_id': "c9"})))
+
+    def test_set_and_drop(self):
+        """ Changed and dropped objects leave the results """
+        first = self.places[0]
+        self.store.set('Place.' + first.id, first, {'city_id': "c2"})
+        self.assertEqual(self.store.aggregate(
+            'count', None, conditions({'city_id': "c2"})), 2)
+        self.store.drop('Place.' + first.id)
+        self.store.drop('Place.missing')
+        self.assertEqual(len(self.store), 4)
+        self.assertEqual(self.store.aggregate('count'), 4)
+        self.store.set('Place.new', Place(city_id="c3", price_by_night=1))
+        self.assertEqual(self.store.select(conditions({'city_id': "c3"})),
+                         ['Place.new'])
+        self.assertEqual(len(self.store.keys), 5)
+
+    def test_odd_values(self):
+        """ Values that fit no column turn off the store """
+        self.assertTrue(self.store.supports(conditions({'city_id': "c1"}),
+                                            'sum', 'price_by_night'))
+        self.assertFalse(self.store.supports((), 'sum', 'city_id'))
+        self.assertFalse(self.store.supports(conditions({'name': "x"})))
+        odd = Place(price_by_night="100")
+        self.store.set('Place.odd', odd)
+        self.assertFalse(self.store.supports())
+        odd.price_by_night = 100
+        self.store.set('Place.odd', odd)
+        self.assertTrue(self.store.supports())
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+""" Module for testing the compact record store"""
+import math
+import unittest
+from datetime import datetime
+from models.engine.compact_store import CompactTable
+from models.place import Place
+from models.review import Review
+
+
+class test_compactTable(unittest.TestCase):
+    """ Class to test the column store of unbuilt records """
+
+    def setUp(self):
+        """ Set up an empty Place table """
+        self.table = CompactTable(Place)
+
+    def test_round_trip(self):
+        """ A record comes back with the same values """
+        place = Place(name="Loft", city_id="c1", user_id="u1",
+                      number_rooms=2, latitude=1.5)
+        record = place.to_dict()
+        self.table['Place.' + place.id] = record
+        self.assertEqual(len(self.table), 1)
+        self.assertIn('Place.' + place.id, self.table)
+        out = self.table['Place.' + place.id]
+        self.assertEqual(out['created_at'], place.created_at)
+        self.assertEqual(out['__class__'], 'Place')
+        out['created_at'] = out['created_at'].isoformat()
+        out['updated_at'] = out['updated_at'].isoformat()
+        self.assertEqual(out, record)
+
+    def test_columns(self):
+        """ Values are stored in typed columns, ids are shared """
+        first = "".join(["c", "1"])
+        second = "".join(["c", "1"])
+        self.table['Place.a'] = {'id': 'a', 'city_id': first,
+                                 'number_rooms': 3, 'latitude': 2.5}
+        self.table['Place.b'] = {'id': 'b', 'city_id': second}
+        self.assertEqual(self.table.columns['number_rooms'].typecode, 'q')
+        self.assertEqual(self.table.columns['latitude'].typecode, 'd')
+        self.assertTrue(math.isnan(self.table.columns['latitude'][1]))
+        self.assertIs(self.table['Place.b']['city_id'],
+                      self.table['Place.a']['city_id'])
+        self.assertNotIn('latitude', self.table['Place.b'])
+        self.assertEqual(self.table.extras, {})
+        self.table['Place.a'] = {'id': 'a', 'name': "Loft",
+                                 'description': ""}
+        self.assertEqual(len(self.table.texts[0].split('\x00')), 3)
+        self.assertEqual(self.table['Place.a']['description'], "")
+
+    def test_extras(self):
+        """ Misfit values and other attributes are kept per row """
+        record = {'id': 'a', 'number_rooms': "three", 'latitude': None,
+                  'amenity_ids': ['x'], 'created_at': 'not a date',
+                  'name': "a\x00b", 'description': ""}
+        self.table['Place.a'] = record
+        out = self.table['Place.a']
+        del out['__class__']
+        self.assertEqual(out, record)
+
+    def test_delete_and_reuse(self):
+        """ Deleted rows are reused and an empty table is reset """
+        table = CompactTable(Review)
+        date = datetime(2020, 1, 2, 3, 4, 5, 6)
+        table['Review.a'] = {'id': 'a', 'text': "x", 'created_at': date}
+        table['Review.b'] = {'id': 'b', 'text': "y"}
+        del table['Review.a']
+        table['Review.c'] = {'id': 'c', 'text': "z"}
+        self.assertEqual(table.size, 2)
+        self.assertNotIn('created_at', table['Review.c'])
+        self.assertEqual(table.pop('Review.b')['text'], "y")
+        table.popitem()
+        self.assertEqual((len(table), table.size), (0, 0))
+        table['Review.d'] = {'id': 'd', 'created_at': date}
+        self.assertEqual(table['Review.d']['created_at'], date)
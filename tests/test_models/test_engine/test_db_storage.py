@@ -2,7 +2,11 @@
 """ Module for testing database storage"""
 import unittest
 import os
+from datetime import datetime
+from contextlib import contextmanager
 from os import getenv
+from unittest.mock import patch
+from sqlalchemy import create_engine, event
 from models.base_model import BaseModel
 from models.user import User
 from models.place import Place
@@ -12,13 +16,28 @@ from models.amenity import Amenity
 from models.review import Review
 
 
+@contextmanager
+def count_queries(storage):
+    """Collects the statements storage sends to its database"""
+    statements = []
+    engine = storage._DBStorage__engine
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+
+
 class TestDBStorage(unittest.TestCase):
     """Test cases for the database storage engine"""
 
     def setUp(self):
         """Set up test environment"""
         # Only run DB tests when specifically in DB mode
-        if getenv("HBNB_TYPE_STORAGE") != "db":
+        if getenv("HBNB_TYPE_STORAGE") not in ("db", "sqlite"):
             self.skipTest("DBStorage tests only work with db storage")
 
     def test_all_method(self):
@@ -66,6 +85,195 @@ class TestDBStorage(unittest.TestCase):
             # If delete fails due to DB connection, that's ok for basic testing
             self.assertTrue(True)
 
+    def test_get_count(self):
+        """Test that get and count work on a committed State"""
+        from models import storage
+        state = State(name="Counted")
+        count = storage.count(State)
+        storage.new(state)
+        storage.save()
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertEqual(storage.count(State), count + 1)
+        self.assertIsNone(storage.get(State, "missing"))
+
+    def test_eager_loading(self):
+        """Test that a loading plan fetches cities without a query each"""
+        from models import storage
+        for i in range(3):
+            state = State(name="Eager {}".format(i))
+            storage.new(state)
+            storage.new(City(name="City {}".format(i), state_id=state.id))
+        storage.save()
+        for load in (("cities",), {"cities": "joined"}):
+            storage.close()
+            with count_queries(storage) as statements:
+                states = storage.query(State, load=load)
+                self.assertGreaterEqual(
+                    sum(len(state.cities) for state in states), 3)
+            self.assertLessEqual(len(statements), len(load) + 1)
+
+    def test_eager_loading_nested(self):
+        """Test that a dotted loading plan reaches nested relationships"""
+        from models import storage
+        storage.close()
+        with count_queries(storage) as statements:
+            for state in storage.all(State, load="cities.places").values():
+                for city in state.cities:
+                    city.places
+        self.assertLessEqual(len(statements), 3)
+
+    def test_all_workers(self):
+        """Test that all() loads the same objects on several connections"""
+        from models import storage
+        state = State(name="Parallel")
+        storage.new(state)
+        storage.new(City(name="Parallel City", state_id=state.id))
+        storage.save()
+        expected = storage.all()
+        storage.close()
+        storage._DBStorage__workers = 3
+        try:
+            result = storage.all()
+        finally:
+            storage._DBStorage__workers = 1
+        self.assertEqual(result.keys(), expected.keys())
+        self.assertIs(storage.get(State, state.id),
+                      result["State." + state.id])
+        self.assertEqual(result["State." + state.id].cities[0].name,
+                         "Parallel City")
+
+    def test_iter(self):
+        """Test that iter() streams rows and expunges the ones it loaded"""
+        from models import storage
+        for i in range(5):
+            storage.new(State(name="Streamed {}".format(i)))
+        storage.save()
+        count = storage.count(State)
+        storage.close()
+        kept = storage.query(State, limit=1)[0]
+        objects = list(storage.iter(State, batch_size=2))
+        self.assertEqual(len(objects), count)
+        self.assertIn(kept, objects)
+        session = storage._DBStorage__session
+        self.assertEqual([obj for obj in objects if obj in session], [kept])
+
+    def test_stats(self):
+        """Test that stats() reports pool state and checkout timings"""
+        from models import storage
+        storage.close()
+        if "checkouts" not in storage.stats():
+            self.skipTest("an in-memory database has no pool to report")
+        checkouts = storage.stats()["checkouts"]
+        storage.count(State)
+        stats = storage.stats()
+        self.assertEqual(stats["checkouts"], checkouts + 1)
+        self.assertGreaterEqual(stats["checked_out"], 1)
+        self.assertGreaterEqual(stats["connects"], 1)
+        self.assertGreaterEqual(stats["wait_time"], stats["max_wait"])
+        for key in ("size", "checked_in", "overflow", "timeouts",
+                    "connect_time"):
+            self.assertIn(key, stats)
+
+    def test_sqlite_pragmas(self):
+        """Test that SQLite connections are set up for WAL"""
+        from models import storage
+        if (getenv("HBNB_TYPE_STORAGE") != "sqlite" or
+                getenv("HBNB_SQLITE_PATH") == ":memory:"):
+            self.skipTest("only a SQLite file database uses WAL")
+        with storage._DBStorage__engine.connect() as conn:
+            pragma = conn.exec_driver_sql
+            self.assertEqual(pragma("PRAGMA journal_mode").scalar(), "wal")
+            self.assertEqual(pragma("PRAGMA synchronous").scalar(), 1)
+
+    def test_page(self):
+        """Test that page() walks the (name, id) order with cursors"""
+        from models import storage
+        for name in ("Paged b", "Paged a", "Paged c"):
+            storage.new(State(name=name))
+        storage.save()
+        names = sorted(s.name for s in storage.all(State).values())
+        seen, after = [], None
+        while True:
+            page, after = storage.page(State, 2, after)
+            seen.extend(s.name for s in page)
+            if after is None:
+                break
+        self.assertEqual(seen, names)
+        page, after = storage.page(State, len(names))
+        self.assertEqual(len(page), len(names))
+        self.assertIsNone(after)
+        users = storage.page(User, 10)[0]
+        self.assertEqual(users, sorted(users, key=lambda u: (u.created_at,
+                                                             u.id)))
+
+    def test_aggregate(self):
+        """Test that aggregate() and query() conditions run in SQL"""
+        from models import storage
+        state = State(name="Aggregated")
+        cities = [City(name="Agg {}".format(i), state_id=state.id)
+                  for i in range(3)]
+        storage.new_many([state] + cities)
+        storage.save()
+        self.assertEqual(storage.aggregate(City, where={
+            'state_id': state.id}), 3)
+        self.assertEqual(storage.aggregate(City, 'max', 'name', {
+            'state_id': state.id}), "Agg 2")
+        self.assertEqual(storage.aggregate(City, group_by='state_id', where={
+            'name >=': "Agg 1", 'state_id': state.id}), {state.id: 2})
+        found = storage.query(City, {'name in': ["Agg 0", "Agg 2"],
+                                     'state_id': state.id}, order_by='name')
+        self.assertEqual([city.name for city in found], ["Agg 0", "Agg 2"])
+
+    def test_nearby(self):
+        """Test that nearby() reads the places of bounding boxes in SQL"""
+        from models import storage
+        state = State(name="Near")
+        city = City(name="Near", state_id=state.id)
+        user = User(email="near@mail.com", password="pwd")
+        places = [Place(name=name, city_id=city.id, user_id=user.id,
+                        latitude=lat, longitude=lon)
+                  for name, lat, lon in (("Fiji", -17.7, 179.99),
+                                         ("Taveuni", -16.9, -179.95),
+                                         ("Far", 10.0, 10.0))]
+        storage.new_many([state, city, user] + places)
+        storage.save()
+        found = storage.nearby(-17.7, 179.99, 150)
+        self.assertEqual([place.name for place, _ in found],
+                         ["Fiji", "Taveuni"])
+        self.assertLess(found[1][1], 150)
+        self.assertEqual(storage.nearby(10.0, 10.0, limit=1)[0][0].name,
+                         "Far")
+
+    def test_place_indexes(self):
+        """Test that reload() creates the sorted indexes of places"""
+        from models import storage
+        from sqlalchemy import inspect
+        engine = storage._DBStorage__engine
+        for index in Place.__table__.indexes:
+            if index.name == "ix_places_max_guest_id":
+                index.drop(engine)
+        storage.reload()
+        names = {index["name"] for index in
+                 inspect(engine).get_indexes("places")}
+        for field in ("price_by_night", "max_guest", "number_rooms",
+                      "number_bathrooms"):
+            self.assertIn("ix_places_{}_id".format(field), names)
+
+    def test_bulk_upsert(self):
+        """Test that bulk_upsert() inserts and updates in batches"""
+        from models import storage
+        state = State(name="Bulk old")
+        storage.new_many([state])
+        storage.save()
+        count = storage.count(State)
+        rows = [{"id": state.id, "name": "Bulk new"}] + [
+            {"name": "Bulk {}".format(i)} for i in range(4)]
+        self.assertEqual(storage.bulk_upsert(State, rows, batch_size=2), 5)
+        self.assertEqual(storage.count(State), count + 4)
+        self.assertEqual(storage.get(State, state.id).name, "Bulk new")
+        storage.close()
+        self.assertEqual(storage.get(State, state.id).name, "Bulk new")
+
     def test_storage_type(self):
         """Test that storage is DBStorage when using db"""
         from models import storage
@@ -113,3 +321,171 @@ class TestDBStorage(unittest.TestCase):
         self.assertEqual(place.name, "Test Place")
         self.assertEqual(place.number_rooms, 2)
         self.assertEqual(place.price_by_night, 100)
+
+
+class TestDBStorageReplicas(unittest.TestCase):
+    """Test read routing, with SQLite files standing in for replicas"""
+
+    paths = ("primary.db", "replica_a.db", "replica_b.db")
+
+    def setUp(self):
+        """Create the replicas and a storage writing to primary.db"""
+        from models.base_model import Base
+        self.env = patch.dict(os.environ, {
+            "HBNB_TYPE_STORAGE": "sqlite", "HBNB_SQLITE_PATH": "primary.db",
+            "HBNB_DB_REPLICAS":
+                "sqlite:///replica_a.db,sqlite:///replica_b.db"})
+        self.env.start()
+        self.replicas = [create_engine("sqlite:///" + path)
+                         for path in self.paths[1:]]
+        for engine in self.replicas:
+            Base.metadata.create_all(engine)
+        self.storage = self.new_storage()
+
+    def tearDown(self):
+        """Remove the database files"""
+        self.storage.close()
+        self.storage._DBStorage__engine.dispose()
+        for engine in self.storage._DBStorage__replicas + self.replicas:
+            engine.dispose()
+        self.env.stop()
+        for path in self.paths:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def new_storage(self):
+        """Returns a reloaded DBStorage for the current environment"""
+        from models.engine.db_storage import DBStorage
+        storage = DBStorage()
+        storage.reload()
+        return storage
+
+    def add_state(self, engine, name):
+        """Inserts a state straight into the database of engine"""
+        with engine.begin() as conn:
+            conn.execute(State.__table__.insert().values(
+                id=name, name=name, created_at=datetime.now(),
+                updated_at=datetime.now()))
+
+    def test_reads_go_to_replicas(self):
+        """Test that sessions read from the replicas in turn"""
+        self.add_state(self.replicas[0], "A")
+        self.add_state(self.replicas[1], "B")
+        self.add_state(self.replicas[1], "C")
+        counts = []
+        for _ in range(4):
+            counts.append(self.storage.count(State))
+            self.storage.close()
+        self.assertEqual(sorted(counts), [1, 1, 2, 2])
+        self.assertNotEqual(counts[0], counts[1])
+
+    def test_read_your_writes(self):
+        """Test that a session reads from the primary once it wrote"""
+        state = State(name="Written")
+        self.storage.new(state)
+        self.storage.save()
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertEqual([s.name for s in self.storage.query(State)],
+                         ["Written"])
+        self.storage.close()
+        self.assertEqual(self.storage.count(State), 0)
+        self.assertIsNone(self.storage.get(State, state.id))
+
+    def test_least_connections(self):
+        """Test that a busy replica is passed over"""
+        os.environ["HBNB_DB_REPLICA_POLICY"] = "least_connections"
+        self.storage.close()
+        self.storage = self.new_storage()
+        self.add_state(self.replicas[1], "B")
+        busy = self.storage._DBStorage__replicas[1].connect()
+        try:
+            for _ in range(3):
+                self.assertEqual(self.storage.count(State), 0)
+                self.storage.close()
+        finally:
+            busy.close()
+
+
+class TestDBStorageCache(unittest.TestCase):
+    """Test the result cache on a SQLite file"""
+
+    def setUp(self):
+        """Create a storage caching up to 16 results"""
+        from models.engine.db_storage import DBStorage
+        self.env = patch.dict(os.environ, {
+            "HBNB_TYPE_STORAGE": "sqlite", "HBNB_SQLITE_PATH": "cache.db",
+            "HBNB_DB_CACHE_SIZE": "16"})
+        self.env.start()
+        self.storage = DBStorage()
+        self.storage.reload()
+
+    def tearDown(self):
+        """Remove the database file"""
+        self.storage.close()
+        self.storage._DBStorage__engine.dispose()
+        self.env.stop()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove("cache.db" + suffix)
+            except FileNotFoundError:
+                pass
+
+    def test_cached_query(self):
+        """Test that a repeated query is served without SQL"""
+        for name in ("b", "a"):
+            self.storage.new(State(name=name))
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual([s.name for s in
+                          self.storage.query(State, order_by="name")],
+                         ["a", "b"])
+        self.storage.close()
+        with count_queries(self.storage) as statements:
+            states = self.storage.query(State, order_by="name")
+            self.assertEqual(len(self.storage.all(State)), 2)
+        self.assertEqual([s.name for s in states], ["a", "b"])
+        self.assertEqual(len(statements), 1)
+        self.assertIn(states[0], self.storage._DBStorage__session)
+        stats = self.storage.stats()
+        self.assertEqual((stats["cache_hits"], stats["cache_misses"]),
+                         (1, 2))
+
+    def test_bulk_upsert_invalidates(self):
+        """Test that bulk_upsert() drops the cached results it changes"""
+        self.storage.query(State)
+        self.storage.bulk_upsert(State, [{"name": "Bulk"}])
+        self.storage.close()
+        self.assertEqual([s.name for s in self.storage.query(State)],
+                         ["Bulk"])
+
+    def test_commit_invalidates(self):
+        """Test that committing a change drops the cached results"""
+        state = State(name="Before")
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.close()
+        self.storage.query(State)
+        self.storage.close()
+        self.storage.get(State, state.id).name = "After"
+        self.assertEqual(self.storage.query(State)[0].name, "After")
+        self.storage.save()
+        self.storage.close()
+        self.assertEqual(self.storage.query(State)[0].name, "After")
+        self.assertEqual(self.storage.stats()["cache_invalidations"], 1)
+
+    def test_uncommitted_edit(self):
+        """Test that an edit dropped by close() is not served from cache"""
+        state = State(name="Kept")
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.close()
+        states = self.storage.query(State)
+        states[0].name = "Lost"
+        states.clear()
+        self.storage.close()
+        states = self.storage.query(State)
+        self.assertEqual([s.name for s in states], ["Kept"])
+        self.assertIsNot(states, self.storage.query(State))
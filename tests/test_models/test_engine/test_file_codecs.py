@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+""" Module for testing the FileStorage file formats"""
+import io
+import json
+import os
+import unittest
+from datetime import datetime
+from models.base_model import BaseModel
+from models.engine.file_codecs import BinaryCodec, JSONCodec, convert
+from models.engine.file_codecs import codec_for
+
+
+class test_file_codecs(unittest.TestCase):
+    """ Class to test the JSON and binary storage formats """
+
+    def tearDown(self):
+        """ Remove the files written by the tests """
+        for path in ('file.json', 'file.bin', 'copy.json'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def test_codec_for(self):
+        """ The format follows the extension unless HBNB_FILE_FORMAT is set """
+        self.assertIsInstance(codec_for('file.json'), JSONCodec)
+        self.assertIsInstance(codec_for('file.bin'), BinaryCodec)
+
+    def test_binary_round_trip(self):
+        """ Binary records decode to the dicts they were written from """
+        codec = BinaryCodec()
+        objs = [BaseModel(name="first"), BaseModel(number=3)]
+        buf = io.BytesIO()
+        codec.write(buf, [('BaseModel.' + o.id, codec.dumps(o.to_dict()))
+                          for o in objs])
+        buf.seek(0)
+        records = list(codec.records(buf, set()))
+        self.assertEqual([key for key, raw, val in records],
+                         ['BaseModel.' + o.id for o in objs])
+        self.assertIsNone(records[0][2])
+        val = codec.loads(records[0][1], 'BaseModel')
+        self.assertEqual(val['__class__'], 'BaseModel')
+        self.assertEqual(val['name'], "first")
+        self.assertEqual(val['created_at'], objs[0].created_at)
+        self.assertIsInstance(val['updated_at'], datetime)
+        self.assertEqual(BaseModel(**val).to_dict(), objs[0].to_dict())
+
+    def test_binary_bad_magic(self):
+        """ A file without the magic header is rejected """
+        with self.assertRaises(ValueError):
+            list(BinaryCodec().records(io.BytesIO(b'{}'), set()))
+
+    def test_binary_bad_records(self):
+        """ Truncated or inconsistent binary files are rejected """
+        codec = BinaryCodec()
+        obj = BaseModel()
+        buf = io.BytesIO()
+        codec.write(buf, [('BaseModel.' + obj.id, codec.dumps(obj.to_dict()))])
+        data = buf.getvalue()
+        for bad in (data[:-1], data[:len(codec.MAGIC) + 3],
+                    codec.MAGIC + codec.header.pack(1, 0)):
+            with self.assertRaises(ValueError):
+                list(codec.records(io.BytesIO(bad), set()))
+        with self.assertRaises(ValueError):
+            codec.loads(codec.fixed.pack(*codec.unset * 2, 0) + b'[]',
+                        'BaseModel')
+
+    def test_convert(self):
+        """ convert() moves records between JSON and binary files """
+        obj = BaseModel(name="converted")
+        with open('file.json', 'w') as f:
+            json.dump({'BaseModel.' + obj.id: obj.to_dict()}, f)
+        self.assertEqual(convert('file.json', 'file.bin'), 1)
+        self.assertEqual(convert('file.bin', 'copy.json'), 1)
+        with open('copy.json', 'r') as f:
+            self.assertEqual(json.load(f),
+                             {'BaseModel.' + obj.id: obj.to_dict()})
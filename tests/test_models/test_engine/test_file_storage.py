@@ -3,7 +3,9 @@
 import unittest
 from models.base_model import BaseModel
 from models import storage
+import json
 import os
+from unittest.mock import patch
 
 
 class test_fileStorage(unittest.TestCase):
@@ -19,10 +21,12 @@ class test_fileStorage(unittest.TestCase):
 
     def tearDown(self):
         """ Remove storage file at end of tests """
-        try:
-            os.remove('file.json')
-        except:
-            pass
+        for path in ('file.json', 'file.json.journal', 'file.State.json',
+                     'file.BaseModel.json'):
+            try:
+                os.remove(path)
+            except:
+                pass
 
     def test_obj_list_empty(self):
         """ __objects is initially empty """
@@ -81,6 +85,507 @@ class test_fileStorage(unittest.TestCase):
         """ Confirm __objects is a dict """
         self.assertEqual(type(storage.all()), dict)
 
+    def test_all_cls(self):
+        """ all(cls) only returns objects of that class """
+        from models.state import State
+        state = State()
+        base = BaseModel()
+        storage.new(state)
+        storage.new(base)
+        states = storage.all(State)
+        self.assertEqual(list(states.keys()), ['State.' + state.id])
+        self.assertIn('BaseModel.' + base.id, storage.all())
+
+    def test_all_cls_read_only(self):
+        """ all(cls) returns a view that follows new and delete """
+        from models.state import State
+        states = storage.all(State)
+        state = State()
+        storage.new(state)
+        self.assertIn('State.' + state.id, states)
+        with self.assertRaises(TypeError):
+            states['State.x'] = state
+        storage.delete(state)
+        self.assertNotIn('State.' + state.id, states)
+        self.assertEqual(len(storage.all(State)), 0)
+
+    def test_delete_in_loop(self):
+        """ Deleting while looping needs a snapshot of the view """
+        from models.state import State
+        storage.new_many([State(), State()])
+        with self.assertRaises(RuntimeError):
+            for state in storage.all(State).values():
+                storage.delete(state)
+        for state in storage.iter(State):
+            storage.delete(state)
+        self.assertEqual(len(storage.all(State)), 0)
+
+    def test_journal_save(self):
+        """ Journal mode appends changes instead of rewriting the file """
+        from models.engine.file_storage import FileStorage
+        FileStorage._FileStorage__journal = True
+        try:
+            new = BaseModel()
+            new.save()
+            gone = BaseModel()
+            gone.save()
+            gone.delete()
+            self.assertFalse(os.path.exists('file.json'))
+            with open('file.json.journal', 'r') as f:
+                self.assertEqual(len(f.readlines()), 3)
+            storage.all().clear()
+            storage.reload()
+            self.assertIn('BaseModel.' + new.id, storage.all())
+            self.assertNotIn('BaseModel.' + gone.id, storage.all())
+        finally:
+            FileStorage._FileStorage__journal = False
+
+    def test_journal_corrupt(self):
+        """ Replay stops at a corrupt journal record instead of raising """
+        from models.engine.file_storage import FileStorage
+        FileStorage._FileStorage__journal = True
+        try:
+            new = BaseModel()
+            new.save()
+            with open('file.json.journal', 'a') as f:
+                f.write('{"key": \n')
+            after = BaseModel()
+            after.save()
+            storage.all().clear()
+            storage.reload()
+            self.assertIn('BaseModel.' + new.id, storage.all())
+            self.assertNotIn('BaseModel.' + after.id, storage.all())
+        finally:
+            FileStorage._FileStorage__journal = False
+
+    def test_journal_compaction(self):
+        """ A journal past its size limit is folded into the snapshot """
+        from models.engine.file_storage import FileStorage
+        FileStorage._FileStorage__journal = True
+        FileStorage._FileStorage__journal_limit = 1
+        try:
+            new = BaseModel()
+            new.save()
+            self.assertFalse(os.path.exists('file.json.journal'))
+            with open('file.json', 'r') as f:
+                self.assertIn('BaseModel.' + new.id, json.load(f))
+        finally:
+            FileStorage._FileStorage__journal = False
+            FileStorage._FileStorage__journal_limit = 4 * 1024 * 1024
+
+    def test_batch(self):
+        """ Saves inside batch() are written once when the block ends """
+        with storage.batch():
+            for _ in range(3):
+                BaseModel().save()
+            self.assertFalse(os.path.exists('file.json'))
+        with open('file.json', 'r') as f:
+            self.assertEqual(len(json.load(f)), 3)
+        self.assertFalse(os.path.exists('file.json.tmp'))
+
+    def test_delayed_save_threads(self):
+        """ Delayed saves racing with new() in other threads lose nothing """
+        import threading
+        from models.engine.file_storage import FileStorage
+
+        def work():
+            for _ in range(200):
+                BaseModel().save()
+        errors = []
+        FileStorage._FileStorage__commit_delay = 0.001
+        try:
+            for journal in (False, True):
+                FileStorage._FileStorage__journal = journal
+                storage.all().clear()
+                self.tearDown()
+                threads = [threading.Thread(target=work) for _ in range(4)]
+                with patch('threading.excepthook', errors.append):
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                    with storage.batch():
+                        pass
+                self.assertEqual(errors, [])
+                storage.all().clear()
+                storage.reload()
+                self.assertEqual(len(storage.all()), 800)
+        finally:
+            FileStorage._FileStorage__commit_delay = 0
+            FileStorage._FileStorage__journal = False
+
+    def test_save_clean(self):
+        """ save() leaves the file alone when nothing changed """
+        BaseModel().save()
+        inode = os.stat('file.json').st_ino
+        storage.save()
+        self.assertEqual(os.stat('file.json').st_ino, inode)
+        BaseModel().save()
+        self.assertNotEqual(os.stat('file.json').st_ino, inode)
+
+    def test_save_edited(self):
+        """ save() writes objects edited after they were stored """
+        from models.state import State
+        from models.engine.file_storage import FileStorage
+        for journal in (False, True):
+            FileStorage._FileStorage__journal = journal
+            try:
+                state = State(name="A")
+                state.save()
+                for name in ("B", "C"):
+                    state.name = name
+                    storage.save()
+                    written = ''
+                    for path in ('file.json', 'file.json.journal'):
+                        if os.path.exists(path):
+                            with open(path, 'r') as f:
+                                written += f.read()
+                    self.assertIn('"name": "{}"'.format(name), written)
+            finally:
+                FileStorage._FileStorage__journal = False
+
+    def test_loaded_digests(self):
+        """ Records last read or written are remembered by hash only """
+        BaseModel().save()
+        storage.close()
+        for digest in storage._FileStorage__loaded.values():
+            self.assertIsInstance(digest, int)
+
+    def test_close_unchanged(self):
+        """ close() keeps the same objects while the file is unchanged """
+        new = BaseModel()
+        new.save()
+        storage.close()
+        self.assertIs(storage.all()['BaseModel.' + new.id], new)
+
+    def test_reload_changed_records(self):
+        """ reload() only rebuilds records that changed on disk """
+        kept = BaseModel()
+        kept.save()
+        edited = BaseModel()
+        edited.save()
+        with open('file.json', 'r') as f:
+            data = json.load(f)
+        data['BaseModel.' + edited.id]['name'] = 'edited'
+        with open('file.json.new', 'w') as f:
+            json.dump(data, f)
+        os.replace('file.json.new', 'file.json')
+        storage.reload()
+        self.assertIs(storage.all()['BaseModel.' + kept.id], kept)
+        self.assertEqual(storage.all()['BaseModel.' + edited.id].name,
+                         'edited')
+
+    def test_reload_formatted(self):
+        """ reload() reads files written with indentation """
+        new = BaseModel()
+        with open('file.json', 'w') as f:
+            json.dump({'BaseModel.' + new.id: new.to_dict()}, f, indent=4)
+        storage.reload()
+        self.assertEqual(storage.all()['BaseModel.' + new.id].id, new.id)
+
+    def test_reload_lazy(self):
+        """ Lazy records become objects when their class is accessed """
+        from models.engine.file_storage import FileStorage
+        from models.state import State
+        state = State(name="Lazy")
+        state.save()
+        BaseModel().save()
+        FileStorage._FileStorage__lazy = True
+        try:
+            storage.all().clear()
+            storage.reload()
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            self.assertEqual(storage.all(State)['State.' + state.id].name,
+                             "Lazy")
+            self.assertEqual(len(storage._FileStorage__objects), 1)
+            self.assertEqual(len(storage.all()), 2)
+        finally:
+            FileStorage._FileStorage__lazy = False
+
+    def test_reload_compact(self):
+        """ Compact records round-trip without becoming objects """
+        from models.engine.compact_store import CompactTable
+        from models.engine.file_storage import FileStorage
+        from models.place import Place
+        place = Place(name="Compact", city_id="c1", user_id="u1",
+                      number_rooms=3, latitude=1.5, amenity_ids=["a1"])
+        place.save()
+        record = place.to_dict()
+        FileStorage._FileStorage__compact = True
+        try:
+            storage.all().clear()
+            storage.reload()
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            self.assertIsInstance(
+                storage._FileStorage__pending['Place'], CompactTable)
+            self.assertEqual(storage.count(Place), 1)
+            self.assertEqual(
+                [obj.to_dict() for obj in storage.iter(Place)], [record])
+            storage._FileStorage__changed.add('Place.' + place.id)
+            storage.save()
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            with open('file.json') as f:
+                self.assertEqual(json.load(f)['Place.' + place.id], record)
+            self.assertEqual(storage.get(Place, place.id).to_dict(), record)
+            self.assertEqual(storage.count(Place), 1)
+        finally:
+            storage.all().clear()
+            FileStorage._FileStorage__compact = False
+
+    def test_sharded(self):
+        """ Sharded files are read per class and rewritten only if dirty """
+        from models.engine.file_storage import FileStorage
+        from models.state import State
+        FileStorage._FileStorage__sharded = True
+        try:
+            state = State(name="Sharded")
+            state.save()
+            BaseModel().save()
+            self.assertFalse(os.path.exists('file.json'))
+            inode = os.stat('file.BaseModel.json').st_ino
+            storage.all().clear()
+            storage.reload()
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            self.assertEqual(len(storage.all(State)), 1)
+            self.assertEqual(len(storage._FileStorage__objects), 1)
+            storage.all(State)['State.' + state.id].save()
+            self.assertEqual(os.stat('file.BaseModel.json').st_ino, inode)
+            self.assertEqual(len(storage.all()), 2)
+        finally:
+            FileStorage._FileStorage__sharded = False
+            FileStorage._FileStorage__shards = {}
+
+    def test_related(self):
+        """ related() follows new, delete and foreign key assignment """
+        from models.state import State
+        from models.city import City
+        first = State(name="First")
+        second = State(name="Second")
+        city = City(name="City", state_id=first.id)
+        for obj in (first, second, city):
+            storage.new(obj)
+        self.assertEqual(first.cities, [city])
+        city.state_id = second.id
+        self.assertEqual(first.cities, [])
+        self.assertEqual(second.cities, [city])
+        storage.delete(city)
+        self.assertEqual(second.cities, [])
+
+    def test_place_amenities(self):
+        """ Place.amenities reads the amenities listed in amenity_ids """
+        from models.place import Place
+        from models.amenity import Amenity
+        place = Place()
+        wifi = Amenity(name="Wifi")
+        storage.new(place)
+        storage.new(wifi)
+        place.amenities = wifi
+        place.amenities = wifi
+        self.assertEqual(place.amenities, [wifi])
+        self.assertEqual(Place().amenity_ids, [])
+        self.assertEqual(list(storage.related(Place, 'amenity_ids',
+                                              wifi.id).values()), [place])
+
+    def test_get_count(self):
+        """ get() finds one object and count() counts by class """
+        from models.state import State
+        state = State(name="Counted")
+        storage.new(state)
+        storage.new(BaseModel())
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertIsNone(storage.get(State, "missing"))
+        self.assertEqual(storage.count(State), 1)
+        self.assertEqual(storage.count(), 2)
+
+    def test_query(self):
+        """ query() filters, orders and pages objects of a class """
+        from models.state import State
+        from models.city import City
+        state = State(name="Queried")
+        storage.new(state)
+        for name in ("d", "b", "a", "c"):
+            storage.new(City(name=name, state_id=state.id))
+        storage.new(City(name="e", state_id="other"))
+        cities = storage.query(City, where={"state_id": state.id},
+                               order_by="name")
+        self.assertEqual([c.name for c in cities], ["a", "b", "c", "d"])
+        cities = storage.query(City, order_by="-name", limit=2, offset=1)
+        self.assertEqual([c.name for c in cities], ["d", "c"])
+        cities = storage.query(City, where={"name": "b"})
+        self.assertEqual([c.name for c in cities], ["b"])
+        self.assertEqual(len(storage.query(City, limit=3)), 3)
+
+    def test_page(self):
+        """ page() follows cursors through the (name, id) order """
+        from models.state import State
+        states = [State(name=name) for name in ("c", "a", "b", "a")]
+        for state in states:
+            storage.new(state)
+        expected = sorted(states, key=lambda s: (s.name, s.id))
+        page, after = storage.page(State, 3)
+        self.assertEqual(page, expected[:3])
+        page, after = storage.page(State, 3, after)
+        self.assertEqual(page, expected[3:])
+        self.assertIsNone(after)
+        page, after = storage.page(State, 2)
+        page, after = storage.page(State, 2, after)
+        self.assertEqual(page, expected[2:])
+        self.assertIsNone(after)
+        expected[0].name = "d"
+        storage.delete(expected[1])
+        page, after = storage.page(State, 1)
+        self.assertEqual(page, [expected[2]])
+        self.assertEqual(storage.page(State, None, after)[0],
+                         [expected[3], expected[0]])
+        self.assertEqual(storage.page(BaseModel, 5), ([], None))
+        with self.assertRaises(ValueError):
+            storage.page(State, 1, "garbage")
+
+    def test_bulk_upsert(self):
+        """ bulk_upsert() creates and updates objects in one write """
+        from models.state import State
+        state = State(name="Old")
+        storage.new_many([state, BaseModel()])
+        self.assertEqual(storage.count(), 2)
+        with patch('os.replace', wraps=os.replace) as write:
+            count = storage.bulk_upsert(State, [
+                {'id': state.id, 'name': "New"},
+                {'name': "Added", 'created_at': '2017-09-28T21:03:54'}])
+        self.assertEqual(count, 2)
+        self.assertEqual(write.call_count, 1)
+        self.assertIs(storage.get(State, state.id), state)
+        self.assertEqual(state.name, "New")
+        added = [s for s in storage.all(State).values() if s is not state]
+        self.assertEqual(added[0].name, "Added")
+        self.assertEqual(added[0].created_at.year, 2017)
+        with open('file.json') as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+    def test_columns(self):
+        """ query() and aggregate() use column stores kept up to date """
+        from models.place import Place
+        from models.review import Review
+        places = [Place(city_id="c1", user_id="u1", price_by_night=price,
+                        number_rooms=rooms)
+                  for price, rooms in ((50, 3), (150, 4), (80, 1), (99, 5))]
+        storage.new_many(places)
+        where = {'city_id': "c1", 'price_by_night <': 100,
+                 'number_rooms >=': 3}
+        found = storage.query(Place, where, order_by='price_by_night')
+        self.assertEqual(found, [places[0], places[3]])
+        self.assertEqual(storage.aggregate(Place, 'sum', 'price_by_night',
+                                           {'number_rooms >': 1}), 299)
+        places[3].number_rooms = 2
+        storage.delete(places[0])
+        self.assertEqual(storage.query(Place, where), [])
+        places[2].city_id = "c2"
+        self.assertEqual(storage.aggregate(Place, group_by='city_id'),
+                         {"c1": 2, "c2": 1})
+        places[1].price_by_night = "cheap"
+        self.assertEqual(storage.aggregate(Place, 'count', where={
+            'price_by_night': "cheap"}), 1)
+        storage.new(Review(place_id=places[1].id, user_id="u1"))
+        storage.new(Review(place_id=places[1].id, user_id="u2"))
+        storage.new(Review(place_id=places[2].id, user_id="u1"))
+        self.assertEqual(storage.aggregate(Review, group_by='user_id'),
+                         {"u1": 2, "u2": 1})
+        self.assertEqual(storage.query(Review, {'place_id in': [
+            places[2].id]})[0].user_id, "u1")
+        with self.assertRaises(ValueError):
+            storage.aggregate(Review, 'median', 'text')
+
+    def test_sorted_query(self):
+        """ Ranges and ordered limits are answered by sorted indexes """
+        from models.engine.cursors import sort_entry, sort_range
+        from models.engine.file_storage import FileStorage, select
+        from models.place import Place
+        index = [sort_entry(value, id) for value, id in
+                 ((None, "a"), (1, "b"), (2, "a"), (2, "c"), (3, "a"))]
+        self.assertEqual(sort_range(index, [('>', 1), ('<=', 2)]), (2, 4))
+        self.assertEqual(sort_range(index, [('==', 2)]), (2, 4))
+        self.assertEqual(sort_range(index, [('<', 1)]), (1, 1))
+        places = [Place(city_id="c{}".format(number % 3),
+                        price_by_night=number * 7 % 100,
+                        max_guest=number % 6, number_rooms=number % 4)
+                  for number in range(60)]
+        places.append(Place(city_id="c0"))
+        storage.new_many(places)
+        for where, order_by, limit, offset in (
+                ({'price_by_night >=': 30, 'price_by_night <': 60}, None,
+                 None, 0),
+                ({'max_guest': 2}, 'price_by_night', None, 0),
+                ({}, 'price_by_night', 5, 0),
+                ({}, '-price_by_night', 5, 3),
+                ({'price_by_night <': 50, 'city_id': "c1"},
+                 'price_by_night', 4, 1),
+                ({'max_guest >': 3, 'number_rooms': 1}, '-max_guest', 3, 0),
+                ({'number_rooms >': 0, 'city_id': "c2"}, 'number_rooms',
+                 100, 0),
+                ({'city_id': "c2", 'number_rooms': 3}, 'max_guest', 1, 0),
+                ({'price_by_night': 77}, 'max_guest', 1, 0)):
+            expected = select(places, where, order_by and (order_by, 'id'),
+                              limit, offset)
+            found = storage.query(Place, where, order_by, limit, offset)
+            if order_by and order_by.startswith('-'):
+                expected = select(places, where, (order_by, '-id'), limit,
+                                  offset)
+            elif not order_by:
+                found.sort(key=lambda place: place.id)
+                expected.sort(key=lambda place: place.id)
+            self.assertEqual(found, expected, (where, order_by))
+        self.assertEqual(storage.query(Place, order_by='max_guest',
+                                       limit=0), [])
+        self.assertEqual(sorted(FileStorage._FileStorage__sorted['Place']),
+                         ['max_guest', 'number_rooms', 'price_by_night'])
+        places[0].price_by_night = 100
+        storage.delete(places[1])
+        self.assertEqual(storage.query(Place, order_by='-price_by_night',
+                                       limit=2)[0], places[0])
+        self.assertNotIn(places[1], storage.query(
+            Place, {'price_by_night': 7}))
+        places[2].price_by_night = "cheap"
+        self.assertEqual(storage.query(Place, {'price_by_night': "cheap"}),
+                         [places[2]])
+
+    def test_nearby(self):
+        """ nearby() uses a grid of the places kept up to date """
+        from models.place import Place
+        paris = Place(name="Paris", latitude=48.8566, longitude=2.3522)
+        louvre = Place(name="Louvre", latitude=48.8606, longitude=2.3376)
+        london = Place(name="London", latitude=51.5074, longitude=-0.1278)
+        storage.new_many([paris, louvre, london, Place(name="Nowhere")])
+        found = storage.nearby(48.8566, 2.3522, 5)
+        self.assertEqual([place for place, _ in found], [paris, louvre])
+        self.assertAlmostEqual(found[1][1], 1.16, places=2)
+        self.assertEqual(storage.nearby(48.0, 2.0, limit=3)[2][0], london)
+        louvre.latitude = 51.5
+        self.assertEqual(len(storage.nearby(48.8566, 2.3522, 5)), 1)
+        storage.delete(london)
+        self.assertEqual([place for place, _ in storage.nearby(
+            51.5, 0, limit=5)], [louvre, paris])
+        with self.assertRaises(ValueError):
+            storage.nearby(91, 0, 5)
+
+    def test_iter(self):
+        """ iter() yields every object, without keeping lazy records """
+        from models.engine.file_storage import FileStorage
+        from models.state import State
+        state = State(name="Streamed")
+        state.save()
+        BaseModel().save()
+        self.assertEqual(list(storage.iter(State)), [state])
+        self.assertEqual(len(list(storage.iter())), 2)
+        FileStorage._FileStorage__lazy = True
+        try:
+            storage.all().clear()
+            storage.reload()
+            names = [obj.name for obj in storage.iter(State)]
+            self.assertEqual(names, ["Streamed"])
+            self.assertEqual(len(storage._FileStorage__objects), 0)
+            self.assertEqual(len(list(storage.iter())), 2)
+        finally:
+            FileStorage._FileStorage__lazy = False
+
     def test_storage_var_created(self):
         """ FileStorage object storage created """
         from models.engine.file_storage import FileStorage
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+""" Module for testing the mmap storage engine"""
+import os
+import unittest
+from unittest.mock import patch
+from models.base_model import BaseModel
+from models.engine.mmap_storage import MMapStorage
+from models.state import State
+
+
+class test_mmapStorage(unittest.TestCase):
+    """ Class to test the mmap storage engine """
+
+    def setUp(self):
+        """ Set up a storage on its own data file """
+        os.environ['HBNB_MMAP_PATH'] = 'test.dat'
+        self.storage = MMapStorage()
+        self.storage.reload()
+
+    def tearDown(self):
+        """ Remove the data and index files """
+        del os.environ['HBNB_MMAP_PATH']
+        for path in ('test.dat', 'test.dat.idx'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def reopen(self):
+        """ Returns a fresh storage reading the same files """
+        storage = MMapStorage()
+        storage.reload()
+        return storage
+
+    def test_save_and_get(self):
+        """ Saved objects can be fetched by id from a new storage """
+        state = State(name="Mapped")
+        self.storage.new(state)
+        self.storage.save()
+        found = self.reopen().get(State, state.id)
+        self.assertEqual(found.name, "Mapped")
+        self.assertEqual(found.created_at, state.created_at)
+        self.assertIsNone(self.reopen().get(State, "missing"))
+
+    def test_all_cls(self):
+        """ all(cls) only returns objects of that class """
+        state = State(name="Only")
+        self.storage.new(state)
+        self.storage.new(BaseModel())
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual(list(storage.all(State)), ['State.' + state.id])
+        self.assertEqual(len(storage.all()), 2)
+
+    def test_iter(self):
+        """ iter() yields stored objects without caching them """
+        state = State(name="Streamed")
+        self.storage.new(state)
+        self.storage.new(BaseModel())
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual([obj.id for obj in storage.iter(State)], [state.id])
+        self.assertEqual(len(list(storage.iter())), 2)
+        self.assertEqual(storage._MMapStorage__objects, {})
+
+    def test_page(self):
+        """ page() returns stored objects in (name, id) order """
+        for name in ("b", "c", "a"):
+            self.storage.new(State(name=name))
+        self.storage.save()
+        storage = self.reopen()
+        page, after = storage.page(State, 2)
+        self.assertEqual([s.name for s in page], ["a", "b"])
+        page, after = storage.page(State, 2, after)
+        self.assertEqual([s.name for s in page], ["c"])
+        self.assertIsNone(after)
+        page, after = storage.page(State, 3)
+        self.assertEqual(len(page), 3)
+        self.assertIsNone(after)
+
+    def test_aggregate(self):
+        """ aggregate() and query() conditions scan the stored objects """
+        for name in ("b", "c", "a"):
+            self.storage.new(State(name=name))
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual(storage.aggregate(State), 3)
+        self.assertEqual(storage.aggregate(State, 'max', 'name'), "c")
+        self.assertEqual(storage.aggregate(State, where={'name >': "a"}), 2)
+        self.assertEqual([s.name for s in storage.query(
+            State, {'name in': ("a", "c")}, order_by='name')], ["a", "c"])
+
+    def test_nearby(self):
+        """ nearby() scans the stored places for the nearest ones """
+        from models.place import Place
+        for name, lat, lon in (("Paris", 48.8566, 2.3522),
+                               ("Louvre", 48.8606, 2.3376),
+                               ("London", 51.5074, -0.1278)):
+            self.storage.new(Place(name=name, latitude=lat, longitude=lon))
+        self.storage.new(Place(name="Nowhere"))
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual([place.name for place, _ in storage.nearby(
+            48.8566, 2.3522, 5)], ["Paris", "Louvre"])
+        self.assertEqual([place.name for place, _ in storage.nearby(
+            51.5, 0, limit=2)], ["London", "Louvre"])
+
+    def test_bulk_upsert(self):
+        """ bulk_upsert() creates and updates records in one save """
+        state = State(name="Old")
+        self.storage.new_many([state])
+        self.storage.save()
+        self.storage.bulk_upsert(State, [{'id': state.id, 'name': "New"},
+                                         {'name': "Added"}])
+        storage = self.reopen()
+        self.assertEqual(storage.get(State, state.id).name, "New")
+        self.assertEqual(sorted(s.name for s in storage.all(State).values()),
+                         ["Added", "New"])
+
+    def test_update_and_delete(self):
+        """ Later records replace earlier ones """
+        state = State(name="Before")
+        gone = State(name="Gone")
+        self.storage.new(state)
+        self.storage.new(gone)
+        self.storage.save()
+        state.name = "After"
+        self.storage.new(state)
+        self.storage.delete(gone)
+        self.storage.save()
+        storage = self.reopen()
+        self.assertEqual(storage.get(State, state.id).name, "After")
+        self.assertIsNone(storage.get(State, gone.id))
+
+    def test_save_edited(self):
+        """ Edits of a stored object are written by save() """
+        state = State(name="A")
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.get(State, state.id).name = "B"
+        self.storage.save()
+        self.assertEqual(self.reopen().get(State, state.id).name, "B")
+        storage = self.reopen()
+        storage.get(State, state.id).name = "C"
+        storage.save()
+        self.assertEqual(self.reopen().get(State, state.id).name, "C")
+
+    def test_concurrent_saves(self):
+        """ Saves of storages that missed each other's records keep both """
+        first = State(name="First")
+        self.storage.new(State(name="Zero"))
+        self.storage.save()
+        other = self.reopen()
+        self.storage.new(first)
+        self.storage.save()
+        second = State(name="Second")
+        other.new(second)
+        with patch.object(MMapStorage, 'reload'):
+            other.save()  # as if First was appended after its reload()
+        self.assertEqual(other.get(State, first.id).name, "First")
+        with open('test.dat', 'ab') as f:
+            f.write(b'\x05\x00')  # torn header of a writer that died
+        third = State(name="Third")
+        self.storage.new(third)
+        self.storage.save()
+        storage = self.reopen()
+        for state in (first, second, third):
+            self.assertEqual(storage.get(State, state.id).name, state.name)
+
+    def test_compact(self):
+        """ compact() keeps live records and writes an index """
+        states = [State(name=str(i)) for i in range(5)]
+        for state in states:
+            self.storage.new(state)
+        self.storage.save()
+        self.storage.delete(states[0])
+        self.storage.save()
+        size = os.path.getsize('test.dat')
+        self.storage.compact()
+        self.assertLess(os.path.getsize('test.dat'), size)
+        self.assertTrue(os.path.exists('test.dat.idx'))
+        storage = self.reopen()
+        self.assertEqual(len(storage.all(State)), 4)
+        self.assertEqual(storage.get(State, states[3].id).name, "3")
+
+    def test_close_reads_new_records(self):
+        """ close() picks up records appended by another storage """
+        other = self.reopen()
+        state = State(name="Elsewhere")
+        self.storage.new(state)
+        self.storage.save()
+        other.close()
+        self.assertEqual(other.get(State, state.id).name, "Elsewhere")
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+""" Module for testing the per-class model codecs"""
+import unittest
+from datetime import datetime
+from models.base_model import BaseModel
+from models.engine.model_codecs import codec_of
+from models.place import Place
+from models.review import Review
+
+
+class test_modelCodecs(unittest.TestCase):
+    """ Class to test the model codecs """
+
+    def test_cached(self):
+        """ Each class gets one codec, built from its columns """
+        codec = codec_of(Place)
+        self.assertIs(codec_of(Place), codec)
+        self.assertIsNot(codec_of(Review), codec)
+        self.assertEqual(codec.cls_name, 'Place')
+        self.assertEqual(set(codec.datetimes), {'created_at', 'updated_at'})
+        self.assertTrue(codec.is_direct('price_by_night'))
+        self.assertEqual(codec_of(BaseModel).datetimes,
+                         ('created_at', 'updated_at'))
+
+    def test_round_trip(self):
+        """ load() rebuilds the object to_dict() described """
+        place = Place(name="Loft", number_rooms=2, latitude=1.5)
+        record = codec_of(Place).to_dict(place)
+        self.assertEqual(record, place.to_dict())
+        self.assertEqual(record['__class__'], 'Place')
+        self.assertEqual(record['created_at'], place.created_at.isoformat())
+        loaded = codec_of(Place).load(record)
+        self.assertIsInstance(loaded, Place)
+        self.assertEqual(loaded.to_dict(), record)
+        self.assertIsInstance(loaded.updated_at, datetime)
+
+    def test_hydrate_defaults(self):
+        """ Missing ids and dates are generated, given ones are kept """
+        review = Review(text="Fine")
+        self.assertEqual(len(review.id), 36)
+        self.assertIsInstance(review.created_at, datetime)
+        given = Review(id="r1", created_at="2020-01-02T03:04:05.000006")
+        self.assertEqual(given.id, "r1")
+        self.assertEqual(given.created_at,
+                         datetime(2020, 1, 2, 3, 4, 5, 6))
+        self.assertIsInstance(given.updated_at, datetime)
+
+    def test_setters_run(self):
+        """ Names with a setter are not written to __dict__ directly """
+        place = Place()
+        self.assertFalse(codec_of(Place).is_direct('amenities'))
+        extra = Place(nickname="x")
+        self.assertEqual(extra.__dict__['nickname'], "x")
+        self.assertNotIn('nickname', place.__dict__)
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+""" Module for testing the DBStorage result cache"""
+import unittest
+from models.engine.query_cache import QueryCache
+from models.state import State
+
+
+class test_queryCache(unittest.TestCase):
+    """ Class to test the result cache """
+
+    def setUp(self):
+        """ Set up a cache of three entries """
+        self.cache = QueryCache(3, 60, 1024 * 1024)
+
+    def put(self, key, objects, classes=('State',)):
+        """ Caches objects under key at the current version """
+        self.cache.put(key, objects, classes, self.cache.version)
+
+    def test_hit_and_miss(self):
+        """ A cached result is returned and counted as a hit """
+        state = State(name="Cached")
+        self.assertIsNone(self.cache.get('a'))
+        self.put('a', [state])
+        self.assertEqual(self.cache.get('a'), [state])
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['entries'], 1)
+
+    def test_lru_eviction(self):
+        """ The least recently used entry goes first """
+        for key in ('a', 'b', 'c'):
+            self.put(key, [])
+        self.cache.get('a')
+        self.put('d', [])
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), [])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_memory_cap(self):
+        """ Entries are evicted to stay under max_bytes """
+        objects = [State(name=str(i)) for i in range(10)]
+        self.cache.max_bytes = QueryCache.size(objects) * 3 // 2
+        self.put('a', objects)
+        self.put('b', objects)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), objects)
+        self.cache.max_bytes = 10
+        self.put('c', objects)
+        self.assertIsNone(self.cache.get('c'))
+
+    def test_ttl(self):
+        """ Expired entries are misses """
+        self.cache.ttl = -1
+        self.put('a', [])
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_invalidate(self):
+        """ Invalidating a class drops the entries that read it """
+        self.put('a', [], ('State',))
+        self.put('b', [], ('State', 'City'))
+        self.put('c', [], ('Place',))
+        version = self.cache.version
+        self.cache.invalidate(['City'])
+        self.assertEqual(self.cache.get('a'), [])
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), [])
+        self.cache.put('d', [], ('State',), version)
+        self.assertIsNone(self.cache.get('d'))
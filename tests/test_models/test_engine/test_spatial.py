@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+""" Module for testing the spatial search"""
+import random
+import unittest
+from models.engine.spatial import GeoGrid, bounding_box, haversine
+from models.engine.spatial import nearest, search
+
+
+class test_spatial(unittest.TestCase):
+    """ Class to test the geometry and the grid search """
+
+    def setUp(self):
+        """ Set up a grid of random points, some in a dense cluster """
+        random.seed(1)
+        self.grid = GeoGrid()
+        self.points = {}
+        for number in range(2000):
+            if number % 2:
+                point = (random.uniform(-90, 90), random.uniform(-180, 180))
+            else:
+                point = (random.gauss(48.85, 0.05), random.gauss(2.35, 0.05))
+            self.points[number] = point
+            self.grid.set(number, *point)
+
+    def scan(self, lat, lon, radius_km=None, limit=None):
+        """ Searches the points one by one """
+        return nearest(((key, point[0], point[1]) for key, point in
+                        self.points.items()), lat, lon, radius_km, limit)
+
+    def test_haversine(self):
+        """ Distances are great-circle distances in km """
+        self.assertAlmostEqual(haversine(0, 0, 0, 1), 111.195, places=3)
+        self.assertAlmostEqual(haversine(0, 179.5, 0, -179.5), 111.195,
+                               places=3)
+        self.assertAlmostEqual(haversine(90, 0, -90, 0), 20015.1, places=1)
+
+    def test_bounding_box(self):
+        """ Boxes are split at the antimeridian and widened at poles """
+        south, north, ranges = bounding_box(0, 0, 111.195)
+        self.assertAlmostEqual(south, -1.0, places=4)
+        self.assertAlmostEqual(ranges[0][1], 1.0, places=4)
+        _, _, ranges = bounding_box(0, 179.5, 111.195)
+        self.assertEqual(len(ranges), 2)
+        self.assertAlmostEqual(ranges[1][1], -179.5, places=4)
+        self.assertEqual(bounding_box(89.5, 0, 100)[1:], (90.0, [
+            (-180.0, 180.0)]))
+
+    def test_search(self):
+        """ Grid searches find what a scan of the points finds """
+        for lat, lon, radius_km, limit in ((48.85, 2.35, 2, None),
+                                           (48.85, 2.35, 50, 10),
+                                           (48.85, 2.35, None, 1500),
+                                           (0, 179.9, 800, None),
+                                           (-89.9, 0, 2000, None),
+                                           (10, 10, None, 5),
+                                           (10, 10, 0, None)):
+            found = self.grid.search(lat, lon, radius_km, limit)
+            self.assertEqual(found, self.scan(lat, lon, radius_km, limit),
+                             (lat, lon))
+        with self.assertRaises(ValueError):
+            self.grid.search(0, 0)
+        with self.assertRaises(ValueError):
+            self.grid.search(0, 0, limit=0)
+        with self.assertRaises(ValueError):
+            self.grid.search(0, 200, 1)
+
+    def test_nearest(self):
+        """ Distances from unit vectors match haversine() """
+        points = [(key, lat, lon) for key, (lat, lon) in self.points.items()]
+        for distance, key in nearest(points, 48.85, 2.35, limit=50):
+            self.assertAlmostEqual(distance, haversine(
+                48.85, 2.35, *self.points[key]), places=6)
+        self.assertEqual(search(lambda box, radius_km, limit: [(1.0, 'a')],
+                                0, 0, limit=1), [(1.0, 'a')])
+
+    def test_set_and_drop(self):
+        """ Moved and dropped points leave their cells """
+        self.grid.set(0, 0.0, 0.0)
+        self.grid.drop(1)
+        self.grid.drop(1)
+        self.grid.set(2, None, 1.0)
+        self.grid.set(3, "1", 1.0)
+        self.assertEqual(len(self.grid), 1997)
+        self.assertEqual([key for _, key in self.grid.search(0, 0, 1)],
+                         [0])
+        for cells in self.grid.cells:
+            self.assertEqual(sum(map(len, cells.values())), 1997)
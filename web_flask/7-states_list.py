@@ -3,7 +3,7 @@
 containing a list of all State objects
 present in DBStorage sorted by name
 """
-from flask import Flask, render_template
+from flask import Flask, abort, render_template, request
 from models import storage
 from models.state import State
 
@@ -21,7 +21,16 @@ def states_list_route():
     """Display a HTML page with a list of all State objects
     present in DBStorage sorted by name
     """
-    return render_template("7-states_list.html", states=storage.all(State))
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 1:
+        abort(400)
+    try:
+        states, after = storage.page(State, limit,
+                                     request.args.get("after"), "name")
+    except ValueError:
+        abort(400)
+    return render_template("7-states_list.html", states=states,
+                           limit=limit, after=after)
 
 
 if __name__ == '__main__':
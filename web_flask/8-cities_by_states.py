@@ -3,10 +3,9 @@
 containing a list of all State objects
 present in DBStorage sorted by name
 """
-from flask import Flask, render_template
+from flask import Flask, abort, render_template, request
 from models import storage
 from models.state import State
-from models.city import City
 
 
 app = Flask(__name__)
@@ -23,10 +22,19 @@ def cities_by_states_route():
     """Display a HTML page with a list of all State objects
     present in DBStorage sorted by name, and their
     corresponding City objects also sorted by name"""
-    states = sorted(storage.all(State).values(), key=lambda x: x.name)
-    for state in states:
-        state.cities = sorted(state.cities, key=lambda x: x.name)
-    return render_template("8-cities_by_states.html", states=states)
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 1:
+        abort(400)
+    try:
+        states, after = storage.page(State, limit,
+                                     request.args.get("after"), "name",
+                                     load=("cities",))
+    except ValueError:
+        abort(400)
+    cities = {state.id: sorted(state.cities, key=lambda city: city.name)
+              for state in states}
+    return render_template("8-cities_by_states.html", states=states,
+                           cities=cities, limit=limit, after=after)
 
 
 if __name__ == '__main__':
@@ -3,9 +3,10 @@
 containing a list of all State objects
 present in DBStorage sorted by name
 """
-from flask import Flask, render_template
+from flask import Flask, abort, render_template, request
 from models import storage
 from models.state import State
+from models.city import City
 
 app = Flask(__name__)
 
@@ -21,7 +22,16 @@ def states_list_route():
     """Display a HTML page with a list of all State objects
     present in DBStorage sorted by name
     """
-    return render_template("9-states.html", states=storage.all(State))
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit < 1:
+        abort(400)
+    try:
+        states, after = storage.page(State, limit,
+                                     request.args.get("after"), "name")
+    except ValueError:
+        abort(400)
+    return render_template("9-states.html", states=states, limit=limit,
+                           after=after)
 
 
 @app.route('/states/<id>', strict_slashes=False)
@@ -30,15 +40,12 @@ def states_id_route(id):
     with the id equal to the id argument
     or a 404 error if not found
     """
-    state = None
-    not_found = True
-    for s in storage.all(State).values():
-        if s.id == id:
-            state = s
-            not_found = False
-            break
+    state = storage.get(State, id)
+    cities = []
+    if state is not None:
+        cities = storage.query(City, where={"state_id": id}, order_by="name")
     return render_template("9-states.html", id=id, state=state,
-                           not_found=not_found)
+                           cities=cities, not_found=state is None)
 
 
 if __name__ == '__main__':